@@ -12,10 +12,11 @@ from contextlib import asynccontextmanager
 import uvicorn
 import asyncio
 from functools import lru_cache
+from operator import itemgetter
 
 # Импорты сервисов
 from services.ephem import (
-    get_planets, get_aspects, get_houses, get_moon_phase,
+    get_planets, get_aspects, get_houses, get_moon_phase, get_full_chart,
     initialize_ephemeris, cleanup_ephemeris
 )
 from services.natal_chart import (
@@ -260,10 +261,14 @@ async def lifespan(app: FastAPI):
     initialize_ephemeris()
     print("✅ Swiss Ephemeris инициализирован")
     print("✅ Кеширование активировано")
+    # Счётчики использования ключей сохраняются в фоне, а не в обработке запросов
+    usage_flush_task = asyncio.create_task(key_manager.run_usage_flush_loop())
     print("✅ Аутентификация включена")
     yield
     # Shutdown
     print("🔄 Очистка ресурсов...")
+    usage_flush_task.cancel()
+    key_manager.flush_usage()
     cleanup_ephemeris()
     print("✅ Ресурсы освобождены")
 
@@ -310,7 +315,7 @@ async def root():
         "status": "operational",
         "docs": "/docs",
         "endpoints": {
-            "basic": ["/planets", "/aspects", "/houses", "/moon_phase"],
+            "basic": ["/planets", "/aspects", "/houses", "/moon_phase", "/full_chart"],
             "natal": ["/natal_chart"],
             "advanced": ["/transits", "/progressions", "/synastry", "/planetary_strength"],
             "returns": ["/solar_return", "/lunar_return"],
@@ -474,6 +479,35 @@ async def moon_phase(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Внутренняя ошибка: {str(e)}")
 
+@app.get("/full_chart")
+async def full_chart(
+    datetime_str: str = Query(..., description="Время в формате ISO 8601"),
+    lat: float = Query(..., ge=-90, le=90, description="Широта в градусах"),
+    lon: float = Query(..., ge=-180, le=180, description="Долгота в градусах"),
+    api_key: str = Depends(require_read_permission)
+):
+    """Планеты, аспекты, дома и фаза Луны одним запросом с кешированием"""
+    cache_key = get_cache_key("full_chart", datetime_str=datetime_str, lat=lat, lon=lon)
+    
+    cached = get_cached_response(cache_key)
+    if cached:
+        return cached
+    
+    try:
+        dt = parse_datetime_safe(datetime_str)
+        result = await get_full_chart(dt, lat, lon)
+        
+        if "error" in result:
+            raise HTTPException(status_code=500, detail=result["error"])
+        
+        cache_response(cache_key, result)
+        return result
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Ошибка валидации: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Внутренняя ошибка: {str(e)}")
+
 # ============================================================================
 # НАТАЛЬНАЯ КАРТА
 # ============================================================================
@@ -746,8 +780,8 @@ async def planetary_strength(
                 )
             }
         scores = [(k, v["strength"]["score"]) for k, v in strength_map.items()]
-        strongest = max(scores, key=lambda x: x[1])[0] if scores else None
-        weakest = min(scores, key=lambda x: x[1])[0] if scores else None
+        strongest = max(scores, key=itemgetter(1))[0] if scores else None
+        weakest = min(scores, key=itemgetter(1))[0] if scores else None
         return {
             "natal_chart": {"subject_info": natal_result.get("subject_info"), "planets": planets_data},
             "planets_strength": strength_map,
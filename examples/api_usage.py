@@ -11,16 +11,18 @@ from datetime import datetime
 class EphemerisAPIClient:
     """Клиент для работы с Ephemeris Decoder API с аутентификацией"""
 
-    def __init__(self, base_url="http://localhost:8000", api_key=None):
+    def __init__(self, base_url="http://localhost:8000", api_key=None, timeout=30):
         """
         Инициализация клиента
 
         Args:
             base_url: URL API сервера
             api_key: API ключ для аутентификации
+            timeout: Таймаут запросов в секундах
         """
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
+        self.timeout = timeout
         self.session = requests.Session()
 
         # Устанавливаем API ключ в заголовки по умолчанию
@@ -36,7 +38,7 @@ class EphemerisAPIClient:
             "extra": extra
         }
 
-        response = self.session.get(f"{self.base_url}/planets", params=params)
+        response = self.session.get(f"{self.base_url}/planets", params=params, timeout=self.timeout)
         response.raise_for_status()
         return response.json()
 
@@ -48,7 +50,7 @@ class EphemerisAPIClient:
             "lon": lon
         }
 
-        response = self.session.get(f"{self.base_url}/aspects", params=params)
+        response = self.session.get(f"{self.base_url}/aspects", params=params, timeout=self.timeout)
         response.raise_for_status()
         return response.json()
 
@@ -60,7 +62,7 @@ class EphemerisAPIClient:
             "lon": lon
         }
 
-        response = self.session.get(f"{self.base_url}/houses", params=params)
+        response = self.session.get(f"{self.base_url}/houses", params=params, timeout=self.timeout)
         response.raise_for_status()
         return response.json()
 
@@ -68,13 +70,18 @@ class EphemerisAPIClient:
         """Получает фазу Луны"""
         params = {"datetime": dt}
 
-        response = self.session.get(f"{self.base_url}/moon_phase", params=params)
+        response = self.session.get(f"{self.base_url}/moon_phase", params=params, timeout=self.timeout)
         response.raise_for_status()
         return response.json()
 
-    def health_check(self):
-        """Проверяет здоровье сервиса"""
-        response = self.session.get(f"{self.base_url}/health")
+    def health_check(self, timeout=3):
+        """
+        Проверяет здоровье сервиса
+
+        Короткий таймаут позволяет быстро обнаружить недоступный сервер,
+        не дожидаясь полного таймаута на каждом следующем запросе
+        """
+        response = self.session.get(f"{self.base_url}/health", timeout=timeout)
         response.raise_for_status()
         return response.json()
 
@@ -89,19 +96,19 @@ class EphemerisAPIClient:
         if expires_days:
             params["expires_days"] = expires_days
 
-        response = self.session.post(f"{self.base_url}/admin/keys", params=params)
+        response = self.session.post(f"{self.base_url}/admin/keys", params=params, timeout=self.timeout)
         response.raise_for_status()
         return response.json()
 
     def list_api_keys(self):
         """Получает список всех API ключей (требует ADMIN прав)"""
-        response = self.session.get(f"{self.base_url}/admin/keys")
+        response = self.session.get(f"{self.base_url}/admin/keys", timeout=self.timeout)
         response.raise_for_status()
         return response.json()
 
     def revoke_api_key(self, key_id):
         """Отзывает API ключ (требует ADMIN прав)"""
-        response = self.session.delete(f"{self.base_url}/admin/keys/{key_id}")
+        response = self.session.delete(f"{self.base_url}/admin/keys/{key_id}", timeout=self.timeout)
         response.raise_for_status()
         return response.json()
 
@@ -211,7 +218,7 @@ def main():
             print("Попробуйте позже или используйте другой API ключ.")
         else:
             print(f"❌ HTTP ошибка: {e.response.status_code} - {e.response.text}")
-    except requests.exceptions.ConnectionError:
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
         print("❌ Ошибка подключения к API.")
         print("Убедитесь, что сервер запущен на http://localhost:8000")
         print("Запустите сервер командой: python run_local.py")
@@ -11,6 +11,15 @@ from datetime import datetime
 BASE_URL = "http://localhost:8000"  # Замените на ваш URL
 API_KEY = "your-api-key-here"       # Замените на ваш API ключ
 
+# Общая сессия: соединение с сервером переиспользуется между запросами,
+# а заголовки задаются один раз. Content-Type для JSON-тела requests
+# выставляет сам (json=), поэтому в общих заголовках его нет
+SESSION = requests.Session()
+SESSION.headers.update({
+    "X-API-Key": API_KEY,
+    "Accept": "application/json"
+})
+
 def create_natal_chart(year, month, day, hour, minute, city, nation, lat, lon, timezone=None):
     """
     Создаёт натальную карту через API
@@ -31,10 +40,6 @@ def create_natal_chart(year, month, day, hour, minute, city, nation, lat, lon, t
         dict: Данные натальной карты или None в случае ошибки
     """
     url = f"{BASE_URL}/natal_chart"
-    headers = {
-        "X-API-Key": API_KEY,
-        "Content-Type": "application/json"
-    }
     
     payload = {
         "year": year,
@@ -52,7 +57,7 @@ def create_natal_chart(year, month, day, hour, minute, city, nation, lat, lon, t
         payload["timezone"] = timezone
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
+        response = SESSION.post(url, json=payload, timeout=15)
         
         if response.status_code == 200:
             return response.json()
@@ -2,9 +2,100 @@
 Сервис для астрологических расчётов: аспекты, транзиты, прогрессии
 """
 
-from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
 import math
 from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
+
+
+# Знаки зодиака в порядке следования (индекс = долгота // 30)
+_ZODIAC_SIGNS_EN = (
+    "Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+    "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"
+)
+
+
+@dataclass(frozen=True)
+class PlanetTable:
+    """
+    Планеты карты в виде параллельных кортежей (структура массивов).
+
+    Калькуляторы принимают как словарь планет, так и PlanetTable:
+    словарь упаковывается один раз на вызов, а готовую таблицу можно
+    переиспользовать между вызовами без повторных обращений к словарям.
+    """
+    names: Tuple[str, ...]
+    longitudes: Tuple[float, ...]
+    speeds: Tuple[float, ...]
+
+    @classmethod
+    def from_dict(cls, planets_data: Dict) -> "PlanetTable":
+        """Упаковывает словарь планет вида {имя: {"longitude": ..., "speed": ...}}"""
+        planets = planets_data.values()
+        return cls(
+            names=tuple(planets_data.keys()),
+            longitudes=tuple(planet["longitude"] for planet in planets),
+            speeds=tuple(planet.get("speed", 0.0) for planet in planets)
+        )
+
+    def index(self, name: str) -> int:
+        """Возвращает позицию планеты в таблице"""
+        return self.names.index(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+Planets = Union[Dict, PlanetTable]
+
+
+class AspectResult(NamedTuple):
+    """Аспект между планетами в компактном виде (без словаря на каждый аспект)"""
+    planet1: str
+    planet2: str
+    aspect: str
+    orb: float
+    is_major: bool
+    color: str
+    style: str
+    angle_diff: float
+
+    def to_dict(self, include_description: bool = True) -> Dict:
+        """Словарь в формате calculate_aspects для JSON-ответа"""
+        aspect = self._asdict()
+        if include_description:
+            aspect["description"] = AspectCalculator.describe(aspect)
+        return aspect
+
+
+def _as_table(planets: Planets) -> PlanetTable:
+    """Приводит входные данные калькулятора к PlanetTable"""
+    if isinstance(planets, PlanetTable):
+        return planets
+    return PlanetTable.from_dict(planets)
+
+
+# Классификация аспектов по характеру
+_HARMONIC_ASPECTS = frozenset(("Trine", "Sextile"))
+_TENSE_ASPECTS = frozenset(("Square", "Opposition"))
+
+# Угловые, успешные и падающие дома
+_ANGULAR_HOUSES = frozenset((1, 4, 7, 10))
+_SUCCEDENT_HOUSES = frozenset((2, 5, 8, 11))
+_CADENT_HOUSES = frozenset((3, 6, 9, 12))
+
+# Достоинства и падения планет: (экзальтация, падение, управление)
+_DIGNITIES = {
+    "Sun": ("Aries", "Libra", frozenset(("Leo",))),
+    "Moon": ("Taurus", "Scorpio", frozenset(("Cancer",))),
+    "Mercury": ("Virgo", "Pisces", frozenset(("Gemini", "Virgo"))),
+    "Venus": ("Pisces", "Virgo", frozenset(("Taurus", "Libra"))),
+    "Mars": ("Capricorn", "Cancer", frozenset(("Aries", "Scorpio"))),
+    "Jupiter": ("Cancer", "Capricorn", frozenset(("Sagittarius", "Pisces"))),
+    "Saturn": ("Libra", "Aries", frozenset(("Capricorn", "Aquarius")))
+}
 
 
 class AspectCalculator:
@@ -29,241 +120,391 @@ class AspectCalculator:
     }
 
     @classmethod
-    def calculate_aspects(cls, planets_data: Dict) -> List[Dict]:
-        """Рассчитывает все аспекты между планетами"""
+    def calculate_aspects(cls, planets_data: Planets,
+                          include_descriptions: bool = True) -> List[Dict]:
+        """
+        Рассчитывает все аспекты между планетами
+
+        При include_descriptions=False поле description не формируется;
+        его можно получить позже через describe().
+        """
+        table = _as_table(planets_data)
+        planet_names = table.names
+        longitudes = table.longitudes
+
+        # Словари результата строим только из уже отсортированных записей
         aspects = []
-        planet_names = list(planets_data.keys())
-
-        # Проверяем все пары планет
-        for i, planet1_name in enumerate(planet_names):
-            for planet2_name in planet_names[i+1:]:
-                planet1 = planets_data[planet1_name]
-                planet2 = planets_data[planet2_name]
-
-                # Вычисляем угловое расстояние между планетами
-                angle1 = planet1["longitude"]
-                angle2 = planet2["longitude"]
-
-                # Нормализуем углы
-                diff = abs(angle1 - angle2)
-                if diff > 180:
-                    diff = 360 - diff
-
-                # Определяем аспект и орб
-                aspect_info = cls._determine_aspect(diff)
-                if aspect_info:
-                    aspects.append({
-                        "planet1": planet1_name,
-                        "planet2": planet2_name,
-                        "aspect": aspect_info["aspect"],
-                        "orb": aspect_info["orb"],
-                        "is_major": aspect_info["is_major"],
-                        "color": aspect_info["color"],
-                        "style": aspect_info["style"],
-                        "angle_diff": diff,
-                        "description": f"{planet1_name} {aspect_info['aspect']} {planet2_name} (орб: {aspect_info['orb']:.1f}°)"
-                    })
+        for i, j, aspect_id, orb in cls.find_aspect_records(table):
+            template = _ASPECT_TEMPLATES[aspect_id]
+            aspect = {
+                "planet1": planet_names[i],
+                "planet2": planet_names[j],
+                "aspect": template[0],
+                "orb": orb,
+                "is_major": template[3],
+                "color": template[4],
+                "style": template[5],
+                "angle_diff": _sep(longitudes[i], longitudes[j])
+            }
+            if include_descriptions:
+                aspect["description"] = cls.describe(aspect)
+            aspects.append(aspect)
 
-        return sorted(aspects, key=lambda x: x["orb"])  # Сортируем по орбу
+        return aspects
+
+    @classmethod
+    def find_aspects(cls, planets_data: Planets) -> List[AspectResult]:
+        """Рассчитывает аспекты между планетами в виде AspectResult, отсортированных по орбу"""
+        table = _as_table(planets_data)
+        planet_names = table.names
+        longitudes = table.longitudes
+
+        aspects = []
+        for i, j, aspect_id, orb in cls.find_aspect_records(table):
+            name, _, _, is_major, color, style = _ASPECT_TEMPLATES[aspect_id]
+            aspects.append(AspectResult(
+                planet_names[i], planet_names[j], name, orb, is_major, color, style,
+                _sep(longitudes[i], longitudes[j])
+            ))
+        return aspects
+
+    @classmethod
+    def find_aspect_records(cls, planets_data: Planets) -> List[Tuple[int, int, int, float]]:
+        """
+        Находит аспекты в компактном виде без построения словарей
+
+        Returns:
+            List: записи (i, j, aspect_id, orb), отсортированные по орбу, где
+            i и j - индексы планет в PlanetTable, aspect_id - индекс
+            в _ASPECT_TEMPLATES (название, угол, орб, мажорный, цвет, стиль)
+        """
+        longitudes = _as_table(planets_data).longitudes
+        count = len(longitudes)
+
+        records = []
+        for i in range(count):
+            angle1 = longitudes[i]
+            for j in range(i + 1, count):
+                match = _match_aspect(_sep(angle1, longitudes[j]))
+                if match is not None:
+                    records.append((i, j, match[0], match[1]))
+
+        records.sort(key=itemgetter(3))  # Сортируем по орбу
+        return records
+
+    @staticmethod
+    def describe(aspect: Dict) -> str:
+        """Формирует текстовое описание аспекта или транзита"""
+        planet1 = aspect.get("planet1", aspect.get("transit_planet"))
+        planet2 = aspect.get("planet2", aspect.get("natal_planet"))
+        return f"{planet1} {aspect['aspect']} {planet2} (орб: {aspect['orb']:.1f}°)"
 
     @classmethod
     def _determine_aspect(cls, angle_diff: float) -> Optional[Dict]:
         """Определяет тип аспекта по угловому расстоянию"""
-        # Сначала проверяем мажорные аспекты
-        for aspect_name, aspect_data in cls.MAJOR_ASPECTS.items():
-            if abs(angle_diff - aspect_data["angle"]) <= aspect_data["orb"]:
-                return {
-                    "aspect": aspect_name,
-                    "orb": abs(angle_diff - aspect_data["angle"]),
-                    "is_major": True,
-                    "color": aspect_data["color"],
-                    "style": aspect_data["style"]
-                }
-
-        # Затем проверяем минорные аспекты
-        for aspect_name, aspect_data in cls.MINOR_ASPECTS.items():
-            if abs(angle_diff - aspect_data["angle"]) <= aspect_data["orb"]:
-                return {
-                    "aspect": aspect_name,
-                    "orb": abs(angle_diff - aspect_data["angle"]),
-                    "is_major": False,
-                    "color": aspect_data["color"],
-                    "style": aspect_data["style"]
-                }
+        match = _match_aspect(angle_diff)
+        if match is None:
+            return None
 
+        aspect_id, orb = match
+        template = _ASPECT_TEMPLATES[aspect_id]
+        return {
+            "aspect": template[0],
+            "orb": orb,
+            "is_major": template[3],
+            "color": template[4],
+            "style": template[5]
+        }
+
+
+# Плоская таблица аспектов: сначала мажорные, затем минорные (порядок проверки).
+# Индекс в таблице служит идентификатором аспекта (aspect_id)
+_ASPECT_TEMPLATES = tuple(
+    (name, data["angle"], data["orb"], is_major, data["color"], data["style"])
+    for aspects, is_major in (
+        (AspectCalculator.MAJOR_ASPECTS, True),
+        (AspectCalculator.MINOR_ASPECTS, False),
+    )
+    for name, data in aspects.items()
+)
+
+
+def _sep(angle1: float, angle2: float) -> float:
+    """
+    Угловое расстояние между двумя долготами в диапазоне 0-180
+
+    Значение совпадает с calculate_orb из utils.zodiac бит в бит:
+    вариант 180 - abs(abs(d) - 180) даёт погрешность округления
+    на малых углах, а ветвление в CPython дешевле вызова min().
+    """
+    diff = abs(angle1 - angle2)
+    return 360 - diff if diff > 180 else diff
+
+
+def _match_aspect(angle_diff: float) -> Optional[Tuple[int, float]]:
+    """Возвращает (aspect_id, орб) или None"""
+    # Классификация кешируется по углу, квантованному до 0.01°.
+    # Углы и орбы аспектов целые, поэтому квантование не теряет
+    # совпадений, а ложные срабатывания на границе орба отсекаются
+    # точной проверкой орба.
+    aspect_id = _classify_aspect(round(angle_diff * 100))
+    if aspect_id is None:
         return None
 
+    template = _ASPECT_TEMPLATES[aspect_id]
+    orb = abs(angle_diff - template[1])
+    if orb > template[2]:
+        return None
+    return aspect_id, orb
+
+
+@lru_cache(maxsize=8192)
+def _classify_aspect(quantized_angle: int) -> Optional[int]:
+    """Возвращает aspect_id для угла в сотых долях градуса"""
+    angle_diff = quantized_angle / 100.0
+    for aspect_id, template in enumerate(_ASPECT_TEMPLATES):
+        if abs(angle_diff - template[1]) <= template[2]:
+            return aspect_id
+    return None
+
 
 class TransitCalculator:
     """Калькулятор транзитов планет"""
 
     @classmethod
-    def calculate_transits(cls, natal_planets: Dict, transit_planets: Dict,
-                          transit_date: datetime) -> List[Dict]:
+    def calculate_transits(cls, natal_planets: Planets, transit_planets: Planets,
+                          transit_date: datetime,
+                          include_descriptions: bool = True) -> List[Dict]:
         """Рассчитывает транзиты планет к натальной карте"""
-        transits = []
-
-        for transit_planet_name, transit_planet in transit_planets.items():
-            for natal_planet_name, natal_planet in natal_planets.items():
-                # Вычисляем угловое расстояние
-                transit_longitude = transit_planet["longitude"]
-                natal_longitude = natal_planet["longitude"]
+        natal = _as_table(natal_planets)
+        transit_table = _as_table(transit_planets)
+        natal_items = tuple(zip(natal.names, natal.longitudes))
 
-                # Нормализуем углы
-                diff = abs(transit_longitude - natal_longitude)
-                if diff > 180:
-                    diff = 360 - diff
+        matches = []
+        for transit_planet_name, transit_longitude in zip(transit_table.names, transit_table.longitudes):
+            for natal_planet_name, natal_longitude in natal_items:
+                diff = _sep(transit_longitude, natal_longitude)
 
                 # Определяем аспект
-                aspect_info = AspectCalculator._determine_aspect(diff)
-                if aspect_info:
-                    transits.append({
-                        "transit_planet": transit_planet_name,
-                        "natal_planet": natal_planet_name,
-                        "aspect": aspect_info["aspect"],
-                        "orb": aspect_info["orb"],
-                        "is_major": aspect_info["is_major"],
-                        "color": aspect_info["color"],
-                        "style": aspect_info["style"],
-                        "transit_longitude": transit_longitude,
-                        "natal_longitude": natal_longitude,
-                        "angle_diff": diff,
-                        "transit_date": transit_date.isoformat(),
-                        "description": f"{transit_planet_name} {aspect_info['aspect']} {natal_planet_name} (орб: {aspect_info['orb']:.1f}°)"
-                    })
+                match = _match_aspect(diff)
+                if match is not None:
+                    matches.append((match[1], transit_planet_name, natal_planet_name,
+                                    transit_longitude, natal_longitude, diff,
+                                    _ASPECT_TEMPLATES[match[0]]))
+
+        matches.sort(key=itemgetter(0))
 
-        return sorted(transits, key=lambda x: x["orb"])
+        transit_date_iso = transit_date.isoformat()
+        transits = []
+        for (orb, transit_planet_name, natal_planet_name,
+             transit_longitude, natal_longitude, diff, template) in matches:
+            transit = {
+                "transit_planet": transit_planet_name,
+                "natal_planet": natal_planet_name,
+                "aspect": template[0],
+                "orb": orb,
+                "is_major": template[3],
+                "color": template[4],
+                "style": template[5],
+                "transit_longitude": transit_longitude,
+                "natal_longitude": natal_longitude,
+                "angle_diff": diff,
+                "transit_date": transit_date_iso
+            }
+            if include_descriptions:
+                transit["description"] = AspectCalculator.describe(transit)
+            transits.append(transit)
+
+        return transits
 
     @classmethod
-    def calculate_progressions(cls, natal_planets: Dict, progression_date: datetime,
+    def calculate_progressions(cls, natal_planets: Planets, progression_date: datetime,
                               birth_date: datetime) -> List[Dict]:
         """Рассчитывает прогрессии планет (вторичные прогрессии)"""
-        progressions = []
-
         # Вычисляем количество дней с рождения
         days_since_birth = (progression_date - birth_date).days
 
-        for natal_planet_name, natal_planet in natal_planets.items():
-            # Вторичные прогрессии: 1 день = 1 год
-            # Луна движется примерно 1° в день
-            if natal_planet_name == "Moon":
-                # Для Луны используем более точный расчёт
-                progressed_longitude = (natal_planet["longitude"] + days_since_birth) % 360
-            else:
-                # Для других планет прогрессия медленнее
-                progressed_longitude = natal_planet["longitude"]
+        natal = _as_table(natal_planets)
+        names = natal.names
+        natal_longitudes = natal.longitudes
+
+        # Вторичные прогрессии: 1 день = 1 год. Луна движется примерно 1° в день,
+        # для других планет прогрессия медленнее (позиция не меняется)
+        progressed_longitudes = [
+            (longitude + days_since_birth) % 360 if name == "Moon" else longitude
+            for name, longitude in zip(names, natal_longitudes)
+        ]
 
-            progressions.append({
-                "planet": natal_planet_name,
-                "natal_longitude": natal_planet["longitude"],
+        progression_date_iso = progression_date.isoformat()
+        return [
+            {
+                "planet": name,
+                "natal_longitude": natal_longitude,
                 "progressed_longitude": progressed_longitude,
-                "progressed_sign": cls._longitude_to_sign(progressed_longitude),
+                "progressed_sign": _ZODIAC_SIGNS_EN[int(progressed_longitude // 30) % 12],
                 "days_since_birth": days_since_birth,
-                "progression_date": progression_date.isoformat()
-            })
-
-        return progressions
+                "progression_date": progression_date_iso
+            }
+            for name, natal_longitude, progressed_longitude
+            in zip(names, natal_longitudes, progressed_longitudes)
+        ]
 
     @classmethod
     def _longitude_to_sign(cls, longitude: float) -> str:
         """Конвертирует долготу в знак зодиака"""
-        signs = [
-            "Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
-            "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"
-        ]
-        sign_index = int(longitude // 30)
-        return signs[sign_index % 12]
+        return _ZODIAC_SIGNS_EN[int(longitude // 30) % 12]
 
 
 class SynastryCalculator:
     """Калькулятор синастрии (совместимости)"""
 
     @classmethod
-    def calculate_synastry(cls, person1_planets: Dict, person2_planets: Dict) -> Dict:
+    def calculate_synastry(cls, person1_planets: Planets, person2_planets: Planets) -> Dict:
         """Рассчитывает синастрию между двумя людьми"""
+        return SynastryContext(person1_planets).compare(person2_planets)
+
+    @classmethod
+    def _calculate_compatibility_score(cls, aspects: List[Dict]) -> int:
+        """Рассчитывает балл совместимости на основе аспектов"""
+        score = 0
+
+        for aspect in aspects:
+            if aspect["is_major"]:
+                if aspect["aspect"] in _HARMONIC_ASPECTS:
+                    score += 3  # Гармоничные аспекты
+                elif aspect["aspect"] == "Conjunction":
+                    score += 2  # Нейтральные аспекты
+                elif aspect["aspect"] in _TENSE_ASPECTS:
+                    score += 1  # Напряжённые аспекты
+            else:
+                score += 1  # Минорные аспекты
+
+        return _normalize_compatibility_score(score, len(aspects))
+
+
+def _normalize_compatibility_score(score: int, aspects_count: int) -> int:
+    """Нормализует сумму весов аспектов до 100 баллов"""
+    max_possible_score = aspects_count * 3
+    if max_possible_score > 0:
+        score = int((score / max_possible_score) * 100)
+
+    return min(100, max(0, score))
+
+
+# Вес каждого аспекта в балле совместимости, индекс - aspect_id
+_ASPECT_SCORES = tuple(
+    (3 if name in _HARMONIC_ASPECTS
+     else 2 if name == "Conjunction"
+     else 1 if name in _TENSE_ASPECTS
+     else 0) if is_major else 1
+    for name, _, _, is_major, _, _ in _ASPECT_TEMPLATES
+)
+
+
+class SynastryContext:
+    """
+    Подготовленные данные первого человека для серии сравнений.
+
+    При сравнении одной карты со многими (подбор пар) долготы и имена
+    опорной карты извлекаются один раз, а compare() выполняет только
+    попарный расчёт со второй картой.
+    """
+
+    def __init__(self, person1_planets: Planets):
+        self._table = _as_table(person1_planets)
+        self._names = self._table.names
+        self._longitudes = self._table.longitudes
+        self._positions = {name: i for i, name in enumerate(self._names)}
+
+    def compare(self, person2_planets: Planets) -> Dict:
+        """Рассчитывает синастрию опорной карты со второй картой"""
         synastry = {
             "aspects": [],
             "composite_points": [],
             "compatibility_score": 0
         }
 
-        # Рассчитываем аспекты между планетами двух людей
-        for planet1_name, planet1 in person1_planets.items():
-            for planet2_name, planet2 in person2_planets.items():
-                # Вычисляем угловое расстояние
-                angle1 = planet1["longitude"]
-                angle2 = planet2["longitude"]
+        person2 = _as_table(person2_planets)
+        person2_items = tuple(zip(person2.names, person2.longitudes))
+        person2_longitudes = dict(person2_items)
 
-                # Нормализуем углы
-                diff = abs(angle1 - angle2)
-                if diff > 180:
-                    diff = 360 - diff
+        # Рассчитываем аспекты между планетами двух людей
+        for planet1_name, angle1 in zip(self._names, self._longitudes):
+            for planet2_name, angle2 in person2_items:
+                diff = _sep(angle1, angle2)
 
                 # Определяем аспект
-                aspect_info = AspectCalculator._determine_aspect(diff)
-                if aspect_info:
+                match = _match_aspect(diff)
+                if match is not None:
+                    aspect_id, orb = match
+                    template = _ASPECT_TEMPLATES[aspect_id]
                     synastry["aspects"].append({
                         "person1_planet": planet1_name,
                         "person2_planet": planet2_name,
-                        "aspect": aspect_info["aspect"],
-                        "orb": aspect_info["orb"],
-                        "is_major": aspect_info["is_major"],
-                        "color": aspect_info["color"],
-                        "style": aspect_info["style"],
-                        "description": f"{planet1_name} {aspect_info['aspect']} {planet2_name}"
+                        "aspect": template[0],
+                        "orb": orb,
+                        "is_major": template[3],
+                        "color": template[4],
+                        "style": template[5],
+                        "description": f"{planet1_name} {template[0]} {planet2_name}"
                     })
 
         # Рассчитываем композитные точки (средние позиции планет)
-        for planet_name in person1_planets.keys():
-            if planet_name in person2_planets:
-                angle1 = person1_planets[planet_name]["longitude"]
-                angle2 = person2_planets[planet_name]["longitude"]
-
-                # Вычисляем среднюю позицию
-                if abs(angle1 - angle2) > 180:
-                    if angle1 < angle2:
-                        angle1 += 360
-                    else:
-                        angle2 += 360
-
-                composite_angle = (angle1 + angle2) / 2
-                composite_angle = composite_angle % 360
-
-                synastry["composite_points"].append({
-                    "planet": planet_name,
-                    "person1_longitude": person1_planets[planet_name]["longitude"],
-                    "person2_longitude": person2_planets[planet_name]["longitude"],
-                    "composite_longitude": composite_angle,
-                    "composite_sign": TransitCalculator._longitude_to_sign(composite_angle)
-                })
+        # Перебираем только общие планеты в порядке первой карты
+        common = self._positions.keys() & person2_longitudes.keys()
+        for position in sorted(self._positions[name] for name in common):
+            planet_name = self._names[position]
+            longitude1 = self._longitudes[position]
+            longitude2 = person2_longitudes[planet_name]
+            angle1 = longitude1
+            angle2 = longitude2
+
+            # Вычисляем среднюю позицию
+            if abs(angle1 - angle2) > 180:
+                if angle1 < angle2:
+                    angle1 += 360
+                else:
+                    angle2 += 360
+
+            composite_angle = (angle1 + angle2) / 2
+            composite_angle = composite_angle % 360
+
+            synastry["composite_points"].append({
+                "planet": planet_name,
+                "person1_longitude": longitude1,
+                "person2_longitude": longitude2,
+                "composite_longitude": composite_angle,
+                "composite_sign": TransitCalculator._longitude_to_sign(composite_angle)
+            })
 
         # Рассчитываем общий балл совместимости
-        synastry["compatibility_score"] = cls._calculate_compatibility_score(synastry["aspects"])
+        synastry["compatibility_score"] = SynastryCalculator._calculate_compatibility_score(synastry["aspects"])
 
         return synastry
 
-    @classmethod
-    def _calculate_compatibility_score(cls, aspects: List[Dict]) -> int:
-        """Рассчитывает балл совместимости на основе аспектов"""
-        score = 0
-
-        for aspect in aspects:
-            if aspect["is_major"]:
-                if aspect["aspect"] in ["Trine", "Sextile"]:
-                    score += 3  # Гармоничные аспекты
-                elif aspect["aspect"] in ["Conjunction"]:
-                    score += 2  # Нейтральные аспекты
-                elif aspect["aspect"] in ["Square", "Opposition"]:
-                    score += 1  # Напряжённые аспекты
-            else:
-                score += 1  # Минорные аспекты
-
-        # Нормализуем до 100 баллов
-        max_possible_score = len(aspects) * 3
-        if max_possible_score > 0:
-            score = int((score / max_possible_score) * 100)
-
-        return min(100, max(0, score))
+    def score_many(self, others: Iterable[Planets]) -> List[int]:
+        """
+        Рассчитывает только балл совместимости опорной карты с каждой из карт
+
+        Задача упирается в вычисления, а не в память: на каждую пару карт
+        приходится K*K проверок аспектов при нескольких десятках байт входных
+        данных. Поэтому здесь не строятся словари аспектов и композитных
+        точек - для каждого совпадения берётся готовый вес из _ASPECT_SCORES.
+        """
+        longitudes1 = self._longitudes
+        scores = []
+        for other in others:
+            longitudes2 = _as_table(other).longitudes
+            score = 0
+            count = 0
+            for angle1 in longitudes1:
+                for angle2 in longitudes2:
+                    match = _match_aspect(_sep(angle1, angle2))
+                    if match is not None:
+                        score += _ASPECT_SCORES[match[0]]
+                        count += 1
+            scores.append(_normalize_compatibility_score(score, count))
+        return scores
 
 
 class ReturnCalculator:
@@ -317,116 +558,140 @@ class DirectionCalculator:
     """Калькулятор дирекций"""
 
     @classmethod
-    def calculate_primary_directions(cls, natal_planets: Dict, 
+    def calculate_primary_directions(cls, natal_planets: Planets,
                                    direction_date: datetime, birth_date: datetime) -> List[Dict]:
         """Рассчитывает первичные дирекции (1° = 1 год)"""
-        directions = []
-        
         # Вычисляем количество лет с рождения
-        years_since_birth = (direction_date - birth_date).days / 365.25
-        
-        for planet_name, planet_info in natal_planets.items():
-            # Первичные дирекции: 1° = 1 год
-            directed_longitude = (planet_info["longitude"] + years_since_birth) % 360
-            
-            directions.append({
-                "planet": planet_name,
-                "natal_longitude": planet_info["longitude"],
-                "directed_longitude": directed_longitude,
-                "directed_sign": TransitCalculator._longitude_to_sign(directed_longitude),
-                "years_since_birth": round(years_since_birth, 2),
-                "direction_date": direction_date.isoformat(),
-                "description": f"{planet_name} в {TransitCalculator._longitude_to_sign(directed_longitude)}"
-            })
-        
-        return directions
+        days_since_birth = (direction_date - birth_date).days
+        years_since_birth = days_since_birth / 365.25
+
+        natal = _as_table(natal_planets)
+        directed_longitudes = _directed_longitudes(
+            natal.names, natal.longitudes, days_since_birth, True
+        )
+
+        return cls._build_directions(
+            natal, directed_longitudes,
+            "years_since_birth", round(years_since_birth, 2), direction_date
+        )
 
     @classmethod
-    def calculate_secondary_directions(cls, natal_planets: Dict,
+    def calculate_secondary_directions(cls, natal_planets: Planets,
                                      direction_date: datetime, birth_date: datetime) -> List[Dict]:
         """Рассчитывает вторичные дирекции (1 день = 1 год)"""
-        directions = []
-        
         # Вычисляем количество дней с рождения
         days_since_birth = (direction_date - birth_date).days
-        
-        for planet_name, planet_info in natal_planets.items():
-            # Вторичные дирекции: 1 день = 1 год
-            # Для Луны: 1° в день, для других планет медленнее
-            if planet_name == "Moon":
-                directed_longitude = (planet_info["longitude"] + days_since_birth) % 360
-            else:
-                # Для других планет используем более медленное движение
-                directed_longitude = (planet_info["longitude"] + days_since_birth * 0.1) % 360
-            
+
+        natal = _as_table(natal_planets)
+        directed_longitudes = _directed_longitudes(
+            natal.names, natal.longitudes, days_since_birth, False
+        )
+
+        return cls._build_directions(
+            natal, directed_longitudes,
+            "days_since_birth", days_since_birth, direction_date
+        )
+
+    @classmethod
+    def _build_directions(cls, natal: PlanetTable, directed_longitudes: Tuple[float, ...],
+                          period_key: str, period_value, direction_date: datetime) -> List[Dict]:
+        """Собирает результат дирекций по заранее вычисленным долготам"""
+        direction_date_iso = direction_date.isoformat()
+        directions = []
+        for planet_name, natal_longitude, directed_longitude in zip(
+                natal.names, natal.longitudes, directed_longitudes):
+            directed_sign = _ZODIAC_SIGNS_EN[int(directed_longitude // 30) % 12]
             directions.append({
                 "planet": planet_name,
-                "natal_longitude": planet_info["longitude"],
+                "natal_longitude": natal_longitude,
                 "directed_longitude": directed_longitude,
-                "directed_sign": TransitCalculator._longitude_to_sign(directed_longitude),
-                "days_since_birth": days_since_birth,
-                "direction_date": direction_date.isoformat(),
-                "description": f"{planet_name} в {TransitCalculator._longitude_to_sign(directed_longitude)}"
+                "directed_sign": directed_sign,
+                period_key: period_value,
+                "direction_date": direction_date_iso,
+                "description": f"{planet_name} в {directed_sign}"
             })
-        
         return directions
 
 
+# Натальная карта в веб-сервисе запрашивается многократно, а дирекции и
+# арабские части зависят только от нескольких чисел. Кешируются числовые
+# результаты по хешируемым аргументам (кортежи долгот, число дней);
+# словари ответа строятся заново, чтобы вызывающий код не мог испортить кеш.
+@lru_cache(maxsize=2048)
+def _directed_longitudes(names: Tuple[str, ...], longitudes: Tuple[float, ...],
+                         days_since_birth: int, primary: bool) -> Tuple[float, ...]:
+    """Дирекционные долготы планет на заданное число дней с рождения"""
+    if primary:
+        # Первичные дирекции: 1° = 1 год
+        years_since_birth = days_since_birth / 365.25
+        return tuple((longitude + years_since_birth) % 360 for longitude in longitudes)
+
+    # Вторичные дирекции: 1 день = 1 год.
+    # Для Луны: 1° в день, для других планет используем более медленное движение
+    moon_shift = days_since_birth
+    planet_shift = days_since_birth * 0.1
+    return tuple(
+        (longitude + (moon_shift if planet_name == "Moon" else planet_shift)) % 360
+        for planet_name, longitude in zip(names, longitudes)
+    )
+
+
+# Формулы арабских частей: (название, планета 1, планета 2, формула, описание)
+# Для Фортуны и Духа упрощённо используются дневные формулы
+_PART_FORMULAS = (
+    ("Part_of_Fortune", "Moon", "Sun", "Asc + (Moon - Sun)",
+     "Часть Фортуны - показывает путь к успеху"),
+    ("Part_of_Spirit", "Sun", "Moon", "Asc + (Sun - Moon)",
+     "Часть Духа - показывает духовные устремления"),
+    ("Part_of_Marriage", "Venus", "Saturn", "Asc + (Venus - Saturn)",
+     "Часть Брака - показывает потенциал отношений"),
+)
+_PART_PLANETS = frozenset(
+    planet for _, planet1, planet2, _, _ in _PART_FORMULAS for planet in (planet1, planet2)
+)
+
+
 class ArabicPartsCalculator:
     """Калькулятор арабских частей"""
 
     @classmethod
-    def calculate_arabic_parts(cls, natal_planets: Dict, ascendant: float) -> Dict:
+    def calculate_arabic_parts(cls, natal_planets: Planets, ascendant: float) -> Dict:
         """Рассчитывает основные арабские части"""
-        parts = {}
-        
         # Формула: Part = Asc + (Planet1 - Planet2)
         # где Asc - асцендент, Planet1 и Planet2 - позиции планет
-        
-        # Часть Фортуны (Part of Fortune)
-        if "Sun" in natal_planets and "Moon" in natal_planets:
-            sun_long = natal_planets["Sun"]["longitude"]
-            moon_long = natal_planets["Moon"]["longitude"]
-            
-            # Для дневного рождения: Part = Asc + (Moon - Sun)
-            # Для ночного рождения: Part = Asc + (Sun - Moon)
-            # Упрощённо используем дневную формулу
-            part_of_fortune = (ascendant + (moon_long - sun_long)) % 360
-            parts["Part_of_Fortune"] = {
-                "longitude": part_of_fortune,
-                "sign": TransitCalculator._longitude_to_sign(part_of_fortune),
-                "formula": "Asc + (Moon - Sun)",
-                "description": "Часть Фортуны - показывает путь к успеху"
-            }
-        
-        # Часть Духа (Part of Spirit)
-        if "Sun" in natal_planets and "Moon" in natal_planets:
-            sun_long = natal_planets["Sun"]["longitude"]
-            moon_long = natal_planets["Moon"]["longitude"]
-            
-            # Для дневного рождения: Part = Asc + (Sun - Moon)
-            part_of_spirit = (ascendant + (sun_long - moon_long)) % 360
-            parts["Part_of_Spirit"] = {
-                "longitude": part_of_spirit,
-                "sign": TransitCalculator._longitude_to_sign(part_of_spirit),
-                "formula": "Asc + (Sun - Moon)",
-                "description": "Часть Духа - показывает духовные устремления"
-            }
-        
-        # Часть Брака (Part of Marriage)
-        if "Venus" in natal_planets and "Saturn" in natal_planets:
-            venus_long = natal_planets["Venus"]["longitude"]
-            saturn_long = natal_planets["Saturn"]["longitude"]
-            
-            part_of_marriage = (ascendant + (venus_long - saturn_long)) % 360
-            parts["Part_of_Marriage"] = {
-                "longitude": part_of_marriage,
-                "sign": TransitCalculator._longitude_to_sign(part_of_marriage),
-                "formula": "Asc + (Venus - Saturn)",
-                "description": "Часть Брака - показывает потенциал отношений"
+        natal = _as_table(natal_planets)
+        planet_longitudes = tuple(
+            (name, longitude)
+            for name, longitude in zip(natal.names, natal.longitudes)
+            if name in _PART_PLANETS
+        )
+
+        return {
+            part_name: {
+                "longitude": part_longitude,
+                "sign": sign,
+                "formula": formula,
+                "description": description
             }
-        
-        return parts
+            for part_name, part_longitude, sign, formula, description
+            in _arabic_part_positions(planet_longitudes, ascendant)
+        }
+
+
+@lru_cache(maxsize=2048)
+def _arabic_part_positions(planet_longitudes: Tuple[Tuple[str, float], ...],
+                           ascendant: float) -> Tuple[Tuple[str, float, str, str, str], ...]:
+    """Долготы и знаки арабских частей: (название, долгота, знак, формула, описание)"""
+    longitudes = dict(planet_longitudes)
+    positions = []
+    for part_name, planet1, planet2, formula, description in _PART_FORMULAS:
+        if planet1 in longitudes and planet2 in longitudes:
+            part_longitude = (ascendant + (longitudes[planet1] - longitudes[planet2])) % 360
+            positions.append((
+                part_name, part_longitude, _ZODIAC_SIGNS_EN[int(part_longitude // 30) % 12],
+                formula, description
+            ))
+    return tuple(positions)
 
 
 class AstrologicalUtilities:
@@ -435,20 +700,20 @@ class AstrologicalUtilities:
     @staticmethod
     def calculate_house_system(ascendant: float, house_system: str = "placidus") -> List[Dict]:
         """Рассчитывает систему домов"""
-        houses = []
-
         # Простая система домов (равнодомная)
-        if house_system == "equal":
-            for i in range(12):
-                house_start = (ascendant + i * 30) % 360
-                houses.append({
-                    "house": i + 1,
-                    "start_longitude": house_start,
-                    "end_longitude": (house_start + 30) % 360,
-                    "sign": TransitCalculator._longitude_to_sign(house_start)
-                })
-
-        return houses
+        if house_system != "equal":
+            return []
+
+        starts = [(ascendant + i * 30) % 360 for i in range(12)]
+        return [
+            {
+                "house": i,
+                "start_longitude": house_start,
+                "end_longitude": (house_start + 30) % 360,
+                "sign": _ZODIAC_SIGNS_EN[int(house_start // 30) % 12]
+            }
+            for i, house_start in enumerate(starts, 1)
+        ]
 
     @staticmethod
     def calculate_retrograde_motion(planet_longitude: float,
@@ -465,6 +730,18 @@ class AstrologicalUtilities:
 
         return diff < 0
 
+    @classmethod
+    def retrograde_mask(cls, longitudes: List[float],
+                        previous_longitudes: List[float]) -> List[bool]:
+        """
+        Пакетный вариант calculate_retrograde_motion
+
+        Для просмотра эфемерид по дням: долготы на текущий и предыдущий
+        шаг передаются параллельными списками, цикл выполняется через map()
+        без обращения к атрибуту класса на каждой итерации.
+        """
+        return list(map(cls.calculate_retrograde_motion, longitudes, previous_longitudes))
+
     @staticmethod
     def calculate_planetary_strength(planet: str, sign: str,
                                    house: int, aspects: List[Dict]) -> Dict:
@@ -475,51 +752,41 @@ class AstrologicalUtilities:
             "factors": []
         }
 
-        # Достоинства и падения планет
-        dignities = {
-            "Sun": {"exaltation": "Aries", "fall": "Libra", "rulership": "Leo"},
-            "Moon": {"exaltation": "Taurus", "fall": "Scorpio", "rulership": "Cancer"},
-            "Mercury": {"exaltation": "Virgo", "fall": "Pisces", "rulership": ["Gemini", "Virgo"]},
-            "Venus": {"exaltation": "Pisces", "fall": "Virgo", "rulership": ["Taurus", "Libra"]},
-            "Mars": {"exaltation": "Capricorn", "fall": "Cancer", "rulership": ["Aries", "Scorpio"]},
-            "Jupiter": {"exaltation": "Cancer", "fall": "Capricorn", "rulership": ["Sagittarius", "Pisces"]},
-            "Saturn": {"exaltation": "Libra", "fall": "Aries", "rulership": ["Capricorn", "Aquarius"]}
-        }
-
-        if planet in dignities:
-            planet_dignities = dignities[planet]
+        planet_dignities = _DIGNITIES.get(planet)
+        if planet_dignities is not None:
+            exaltation, fall, rulership = planet_dignities
 
-            if sign == planet_dignities.get("exaltation"):
+            if sign == exaltation:
                 strength["dignity"] = "exaltation"
                 strength["score"] += 20
                 strength["factors"].append("Экзальтация")
-            elif sign == planet_dignities.get("fall"):
+            elif sign == fall:
                 strength["dignity"] = "fall"
                 strength["score"] -= 20
                 strength["factors"].append("Падение")
-            elif sign in planet_dignities.get("rulership", []):
+            elif sign in rulership:
                 strength["dignity"] = "rulership"
                 strength["score"] += 15
                 strength["factors"].append("Управление")
 
         # Влияние дома
-        if house in [1, 4, 7, 10]:  # Угловые дома
+        if house in _ANGULAR_HOUSES:
             strength["score"] += 10
             strength["factors"].append("Угловой дом")
-        elif house in [2, 5, 8, 11]:  # Успешные дома
+        elif house in _SUCCEDENT_HOUSES:
             strength["score"] += 5
             strength["factors"].append("Успешный дом")
-        elif house in [3, 6, 9, 12]:  # Падающие дома
+        elif house in _CADENT_HOUSES:
             strength["score"] -= 5
             strength["factors"].append("Падающий дом")
 
         # Влияние аспектов
         for aspect in aspects:
             if aspect["is_major"]:
-                if aspect["aspect"] in ["Trine", "Sextile"]:
+                if aspect["aspect"] in _HARMONIC_ASPECTS:
                     strength["score"] += 5
                     strength["factors"].append(f"Гармоничный аспект: {aspect['aspect']}")
-                elif aspect["aspect"] in ["Square", "Opposition"]:
+                elif aspect["aspect"] in _TENSE_ASPECTS:
                     strength["score"] -= 3
                     strength["factors"].append(f"Напряжённый аспект: {aspect['aspect']}")
 
@@ -538,13 +805,8 @@ class AstrologicalUtilities:
         south_node = 180.0
         
         # Расстояние до узлов
-        solar_to_north = abs(solar_longitude - north_node)
-        solar_to_south = abs(solar_longitude - south_node)
-        
-        if solar_to_north > 180:
-            solar_to_north = 360 - solar_to_north
-        if solar_to_south > 180:
-            solar_to_south = 360 - solar_to_south
+        solar_to_north = _sep(solar_longitude, north_node)
+        solar_to_south = _sep(solar_longitude, south_node)
         
         return {
             "north_node": north_node,
@@ -3,17 +3,48 @@
 """
 
 import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from functools import lru_cache
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, FrozenSet, Hashable, List, Optional, Tuple
 import yaml
 import swisseph as swe
 
-from utils.zodiac import degrees_to_sign_and_degrees, normalize_angle, calculate_orb
+from utils.zodiac import (
+    degrees_to_sign_and_degrees_batch, normalize_angle, moon_phase_name
+)
+
+# Глобальный executor для синхронных вычислений.
+# Расширение pyswisseph не отпускает GIL во время расчёта, поэтому потоки
+# не дают параллелизма по CPU: пул лишь выносит расчёт из цикла событий.
+# Отсюда небольшое фиксированное число потоков (больше — только конкуренция
+# за GIL); переопределяется переменной EPHEMERIS_WORKERS.
+# Пул процессов не используется: расчёт занимает доли миллисекунды,
+# и сериализация данных между процессами обошлась бы дороже
+EPHEMERIS_DEFAULT_WORKERS = 4
+
+
+def _workers_from_env(default: int) -> int:
+    """Число потоков из EPHEMERIS_WORKERS; некорректное значение заменяется default"""
+    raw = os.getenv("EPHEMERIS_WORKERS", "").strip()
+    if not raw:
+        return default
+    try:
+        workers = int(raw)
+    except ValueError:
+        workers = 0
+    if workers < 1:
+        print(f"Предупреждение: некорректное EPHEMERIS_WORKERS={raw!r}, используется {default}")
+        return default
+    return workers
+
 
-# Глобальный executor для синхронных вычислений
-executor = ThreadPoolExecutor(max_workers=4)
+EPHEMERIS_WORKERS = _workers_from_env(EPHEMERIS_DEFAULT_WORKERS)
+executor = ThreadPoolExecutor(max_workers=EPHEMERIS_WORKERS)
 
 # Основные планеты (по умолчанию)
 MAIN_PLANETS = {
@@ -41,9 +72,51 @@ EXTRA_POINTS = {
     "Vesta": swe.VESTA
 }
 
-# Кеш для результатов (шаг 1 час)
-_cache: Dict[str, Dict] = {}
-_cache_timestamps: Dict[str, datetime] = {}
+# Те же тела в виде параллельных кортежей имён и идентификаторов для цикла расчёта
+_MAIN_NAMES = tuple(MAIN_PLANETS.keys())
+_MAIN_IDS = tuple(MAIN_PLANETS.values())
+_ALL_NAMES = _MAIN_NAMES + tuple(EXTRA_POINTS.keys())
+_ALL_IDS = _MAIN_IDS + tuple(EXTRA_POINTS.values())
+
+# Тела с заранее известной освещённостью: для них swe.pheno_ut не вызывается.
+# Солнце светится само, у внешних планет фаза с Земли почти не отличается
+# от 100%, у узлов и Лилит (расчётных точек) освещённость не определена
+_FIXED_ILLUMINATION = {
+    swe.SUN: 100.0,
+    swe.JUPITER: 100.0,
+    swe.SATURN: 100.0,
+    swe.URANUS: 100.0,
+    swe.NEPTUNE: 100.0,
+    swe.PLUTO: 100.0,
+    swe.MEAN_NODE: None,
+    -swe.MEAN_NODE: None,
+    swe.MEAN_APOG: None,
+}
+
+# Кеш для результатов (шаг 1 час): LRU с ограничением размера и временем жизни.
+# Значение - (время записи по time.monotonic(), данные); порядок ключей -
+# от давно использованных к недавним. Доступ из потоков executor под блокировкой
+CACHE_MAX_SIZE = 4096
+CACHE_TTL_SECONDS = 3600
+
+# Ключ кеша: (номер часа, смещение часового пояса, широта, долгота, extra)
+CacheKey = Tuple[int, Optional[timedelta], float, float, bool]
+
+_cache: "OrderedDict[Hashable, Tuple[float, Dict]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# Путь к эфемеридам устанавливается один раз (initialize_ephemeris при старте
+# или первый расчёт), а не перед каждым обращением к Swiss Ephemeris
+_ephemeris_initialized = False
+
+
+def _ensure_ephemeris() -> None:
+    """Инициализирует Swiss Ephemeris, если это ещё не сделано"""
+    global _ephemeris_initialized
+    if not _ephemeris_initialized:
+        swe.set_ephe_path()
+        _ephemeris_initialized = True
 
 
 def _datetime_to_jd(dt: datetime) -> float:
@@ -57,33 +130,51 @@ def _datetime_to_jd(dt: datetime) -> float:
     return swe.julday(dt.year, dt.month, dt.day, hour_frac)
 
 
-def _get_cache_key(dt: datetime, lat: float, lon: float, extra: bool = False) -> str:
+def _get_cache_key(dt: datetime, lat: float, lon: float, extra: bool = False) -> CacheKey:
     """Генерирует ключ для кеша"""
-    # Округляем время до часа для кеширования
-    rounded_time = dt.replace(minute=0, second=0, microsecond=0)
-    return f"{rounded_time.isoformat()}_{lat}_{lon}_{extra}"
+    # Округляем время до часа для кеширования: номер часа от начала эры
+    # без строкового форматирования. Смещение часового пояса входит в ключ,
+    # чтобы одинаковое локальное время в разных поясах не совпадало
+    hour_bucket = dt.toordinal() * 24 + dt.hour
+    return hour_bucket, dt.utcoffset(), lat, lon, extra
 
 
-def _is_cache_valid(cache_key: str) -> bool:
+def _get_valid_entry(cache_key: Hashable) -> Optional[Tuple[float, Dict]]:
+    """Возвращает запись кеша, удаляя её, если время жизни истекло (под блокировкой)"""
+    entry = _cache.get(cache_key)
+    if entry is None:
+        return None
+
+    if time.monotonic() - entry[0] >= CACHE_TTL_SECONDS:
+        del _cache[cache_key]
+        return None
+    return entry
+
+
+def _is_cache_valid(cache_key: Hashable) -> bool:
     """Проверяет валидность кеша (не старше 1 часа)"""
-    if cache_key not in _cache_timestamps:
-        return False
-    
-    cache_time = _cache_timestamps[cache_key]
-    return datetime.now() - cache_time < timedelta(hours=1)
+    with _cache_lock:
+        return _get_valid_entry(cache_key) is not None
 
 
-def _get_from_cache(cache_key: str) -> Optional[Dict]:
+def _get_from_cache(cache_key: Hashable) -> Optional[Dict]:
     """Получает данные из кеша"""
-    if _is_cache_valid(cache_key):
-        return _cache.get(cache_key)
-    return None
+    with _cache_lock:
+        entry = _get_valid_entry(cache_key)
+        if entry is None:
+            return None
+
+        _cache.move_to_end(cache_key)
+        return entry[1]
 
 
-def _save_to_cache(cache_key: str, data: Dict):
-    """Сохраняет данные в кеш"""
-    _cache[cache_key] = data
-    _cache_timestamps[cache_key] = datetime.now()
+def _save_to_cache(cache_key: Hashable, data: Dict) -> None:
+    """Сохраняет данные в кеш, вытесняя самые давно использованные записи"""
+    with _cache_lock:
+        _cache[cache_key] = (time.monotonic(), data)
+        _cache.move_to_end(cache_key)
+        while len(_cache) > CACHE_MAX_SIZE:
+            _cache.popitem(last=False)
 
 
 def _calculate_planet_position(planet_id: int, jd: float) -> Tuple[float, float, bool]:
@@ -121,13 +212,15 @@ def _get_illumination_percent(planet_id: int, jd: float) -> Optional[float]:
     Returns:
         Значение 0–100 или None, если явление не определено (узлы и т.п.).
     """
+    # Ошибка не кешируется: она зависит от даты (диапазон файлов эфемерид),
+    # а тела, для которых освещённость не определена вовсе, перечислены
+    # в _FIXED_ILLUMINATION и сюда не попадают
     try:
-        swe.set_ephe_path()
         xx, ret = swe.pheno_ut(jd, planet_id)
         # xx[1] = phase = illuminated fraction (0..1)
         phase = xx[1]
         return round(float(phase) * 100.0, 2)
-    except (Exception, TypeError, IndexError):
+    except Exception:
         return None
 
 
@@ -151,17 +244,18 @@ def _calculate_ascendant(jd: float, lat: float, lon: float) -> float:
 
 def _houses_from_cusps(cusps: list) -> List[Dict]:
     """Преобразует массив куспидов в список домов"""
-    houses = []
     house_cusps = cusps[0:12]
-    for i, longitude in enumerate(house_cusps):
-        sign_name, degrees_in_sign = degrees_to_sign_and_degrees(longitude)
-        houses.append({
-            "house": i + 1,
+    # Знаки всех куспидов определяются одним вызовом
+    signs = degrees_to_sign_and_degrees_batch(house_cusps)
+    return [
+        {
+            "house": i,
             "longitude": longitude,
             "sign": sign_name,
             "degrees_in_sign": degrees_in_sign
-        })
-    return houses
+        }
+        for i, (longitude, (sign_name, degrees_in_sign)) in enumerate(zip(house_cusps, signs), 1)
+    ]
 
 
 def _calculate_houses(jd: float, lat: float, lon: float) -> Tuple[List[Dict], str]:
@@ -171,7 +265,7 @@ def _calculate_houses(jd: float, lat: float, lon: float) -> Tuple[List[Dict], st
     Returns:
         (houses, house_system)
     """
-    swe.set_ephe_path()
+    _ensure_ephemeris()
     
     # Пробуем Placidus
     try:
@@ -187,151 +281,159 @@ def _calculate_houses(jd: float, lat: float, lon: float) -> Tuple[List[Dict], st
             return [], "Placidus"
 
 
+# Конфигурация аспектов: читается один раз при импорте модуля
+ASPECTS_CONFIG_PATH = "config/aspects.yaml"
+_aspects_config: Optional[Tuple[Tuple[str, str, float, float], ...]] = None
+
+
+def _load_aspects_config() -> Tuple[Tuple[str, str, float, float], ...]:
+    """Читает aspects.yaml и разворачивает его в кортеж (тип, название, угол, орб)"""
+    with open(ASPECTS_CONFIG_PATH, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    return tuple(
+        (aspect_name, aspect_data["name"], aspect_data["angle"], aspect_data["orb"])
+        for aspect_name, aspect_data in config["aspects"].items()
+    )
+
+
+def _get_aspects_config() -> Tuple[Tuple[str, str, float, float], ...]:
+    """Возвращает конфигурацию аспектов, при необходимости загружая её повторно"""
+    global _aspects_config
+    if _aspects_config is None:
+        _aspects_config = _load_aspects_config()
+    return _aspects_config
+
+
+try:
+    _get_aspects_config()
+except Exception as e:
+    # Файл может отсутствовать при импорте (другой рабочий каталог);
+    # тогда конфигурация будет загружена при первом расчёте аспектов
+    print(f"Не удалось загрузить {ASPECTS_CONFIG_PATH}: {e}")
+
+
+@lru_cache(maxsize=8)
+def _aspect_candidates(aspects_config: Tuple[Tuple[str, str, float, float], ...]) -> Tuple[Tuple[Tuple[int, float, float], ...], ...]:
+    """
+    Таблица кандидатов по целым градусам углового расстояния 0-180
+
+    Для градуса d хранит аспекты (индекс, угол, орб), чьё окно
+    [угол - орб, угол + орб] пересекает отрезок [d, d + 1]. Порядок
+    индексов сохраняется, поэтому выбор самого точного аспекта совпадает
+    с полным перебором конфигурации
+    """
+    return tuple(
+        tuple(
+            (k, aspect[2], aspect[3])
+            for k, aspect in enumerate(aspects_config)
+            if aspect[2] - aspect[3] <= degree + 1 and aspect[2] + aspect[3] >= degree
+        )
+        for degree in range(181)
+    )
+
+
+def _aspects_core(longitudes: List[float],
+                  aspects_config: Tuple[Tuple[str, str, float, float], ...]) -> List[Tuple[int, int, int, float]]:
+    """
+    Числовое ядро расчёта аспектов: только числа, без словарей и строк
+
+    Args:
+        longitudes: Долготы планет
+        aspects_config: Конфигурация аспектов (тип, название, угол, орб)
+
+    Returns:
+        List: (индекс планеты 1, индекс планеты 2, индекс аспекта в конфигурации, орб)
+        для самого точного аспекта каждой пары
+    """
+    candidates = _aspect_candidates(aspects_config)
+    count = len(longitudes)
+    matches = []
+    
+    for i in range(count):
+        long1 = longitudes[i]
+        for j in range(i + 1, count):
+            # Угловое расстояние (как calculate_orb), всегда в диапазоне 0-180
+            actual_angle = abs(long1 - longitudes[j])
+            if actual_angle > 180:
+                actual_angle = 360 - actual_angle
+            
+            # Находим наиболее точный аспект для этой пары среди кандидатов
+            # её градуса. Углы аспектов лежат в 0-180, поэтому отклонение
+            # не требует нормализации
+            best = -1
+            best_orb = float("inf")
+            
+            for k, target_angle, max_orb in candidates[int(actual_angle)]:
+                orb = abs(actual_angle - target_angle)
+                if orb <= max_orb and orb < best_orb:
+                    best_orb = orb
+                    best = k
+            
+            if best >= 0:
+                matches.append((i, j, best, best_orb))
+    
+    return matches
+
+
 def _calculate_aspects(planets_data: Dict) -> List[Dict]:
     """Вычисляет аспекты между планетами. Для каждой пары возвращает только самый точный аспект."""
     try:
-        with open("config/aspects.yaml", "r", encoding="utf-8") as f:
-            config = yaml.safe_load(f)
-        
-        aspects = []
+        aspects_config = _get_aspects_config()
         planet_names = list(planets_data.keys())
+        longitudes = [planets_data[name]["longitude"] for name in planet_names]
         
-        for i, planet1 in enumerate(planet_names):
-            for planet2 in planet_names[i+1:]:
-                long1 = planets_data[planet1]["longitude"]
-                long2 = planets_data[planet2]["longitude"]
-                actual_angle = calculate_orb(long1, long2)
-                
-                # Находим наиболее точный аспект для этой пары
-                best_aspect = None
-                best_orb = float("inf")
-                
-                for aspect_name, aspect_data in config["aspects"].items():
-                    target_angle = aspect_data["angle"]
-                    max_orb = aspect_data["orb"]
-                    orb = min(
-                        abs(actual_angle - target_angle),
-                        360 - abs(actual_angle - target_angle)
-                    )
-                    
-                    if orb <= max_orb and orb < best_orb:
-                        best_orb = orb
-                        best_aspect = {
-                            "name": aspect_data["name"],
-                            "planets": [planet1, planet2],
-                            "angle": target_angle,
-                            "orb": orb,
-                            "type": aspect_name
-                        }
-                
-                if best_aspect:
-                    aspects.append(best_aspect)
+        aspects = []
+        for i, j, k, orb in _aspects_core(longitudes, aspects_config):
+            aspect_name, display_name, target_angle, _ = aspects_config[k]
+            aspects.append({
+                "name": display_name,
+                "planets": [planet_names[i], planet_names[j]],
+                "angle": target_angle,
+                "orb": orb,
+                "type": aspect_name
+            })
         
         return aspects
     except Exception:
         return []
 
 
-def _calculate_moon_phase_sync(dt: datetime) -> Dict:
-    """Синхронная версия вычисления фазы Луны"""
-    try:
-        jd = _datetime_to_jd(dt)
-        
-        # Убеждаемся, что Swiss Ephemeris инициализирован
-        swe.set_ephe_path()
-        
-        # Получаем позиции Солнца и Луны
-        sun_pos = swe.calc_ut(jd, swe.SUN)[0]
-        moon_pos = swe.calc_ut(jd, swe.MOON)[0]
-        
-        sun_long = sun_pos[0]
-        moon_long = moon_pos[0]
-        
-        # Вычисляем угол между Солнцем и Луной
-        angle = normalize_angle(moon_long - sun_long)
-        
-        # Определяем фазу
-        if angle < 45:
-            phase_name = "Новолуние"
-        elif angle < 90:
-            phase_name = "Растущий серп"
-        elif angle < 135:
-            phase_name = "Первая четверть"
-        elif angle < 180:
-            phase_name = "Растущая Луна"
-        elif angle < 225:
-            phase_name = "Полнолуние"
-        elif angle < 270:
-            phase_name = "Убывающая Луна"
-        elif angle < 315:
-            phase_name = "Последняя четверть"
-        else:
-            phase_name = "Убывающий серп"
-        
-        return {
-            "angle": round(angle, 2),
-            "phase_name": phase_name,
-            "sun_longitude": round(sun_long, 2),
-            "moon_longitude": round(moon_long, 2)
-        }
-    except Exception as e:
-        print(f"Ошибка в _calculate_moon_phase_sync: {e}")
-        return {
-            "angle": 0.0,
-            "phase_name": "Ошибка",
-            "sun_longitude": 0.0,
-            "moon_longitude": 0.0
-        }
+def _moon_phase_from_longitudes(sun_long: float, moon_long: float) -> Dict:
+    """Определяет фазу Луны по уже вычисленным долготам Солнца и Луны"""
+    # Вычисляем угол между Солнцем и Луной
+    angle = normalize_angle(moon_long - sun_long)
+    
+    return {
+        "angle": round(angle, 2),
+        "phase_name": moon_phase_name(angle),
+        "sun_longitude": round(sun_long, 2),
+        "moon_longitude": round(moon_long, 2)
+    }
+
+
+# Ответ фазы Луны, когда позицию Солнца или Луны вычислить не удалось
+_MOON_PHASE_ERROR = {
+    "angle": 0.0,
+    "phase_name": "Ошибка",
+    "sun_longitude": 0.0,
+    "moon_longitude": 0.0
+}
 
 
 def _calculate_moon_phase(jd: float) -> Dict:
     """Вычисляет фазу Луны (принимает юлианскую дату)"""
     try:
         # Убеждаемся, что Swiss Ephemeris инициализирован
-        swe.set_ephe_path()
+        _ensure_ephemeris()
         
         # Получаем позиции Солнца и Луны
         sun_pos = swe.calc_ut(jd, swe.SUN)[0]
         moon_pos = swe.calc_ut(jd, swe.MOON)[0]
         
-        sun_long = sun_pos[0]
-        moon_long = moon_pos[0]
-        
-        # Вычисляем угол между Солнцем и Луной
-        angle = normalize_angle(moon_long - sun_long)
-        
-        # Определяем фазу
-        if angle < 45:
-            phase_name = "Новолуние"
-        elif angle < 90:
-            phase_name = "Растущий серп"
-        elif angle < 135:
-            phase_name = "Первая четверть"
-        elif angle < 180:
-            phase_name = "Растущая Луна"
-        elif angle < 225:
-            phase_name = "Полнолуние"
-        elif angle < 270:
-            phase_name = "Убывающая Луна"
-        elif angle < 315:
-            phase_name = "Последняя четверть"
-        else:
-            phase_name = "Убывающий серп"
-        
-        return {
-            "angle": round(angle, 2),
-            "phase_name": phase_name,
-            "sun_longitude": round(sun_long, 2),
-            "moon_longitude": round(moon_long, 2)
-        }
+        return _moon_phase_from_longitudes(sun_pos[0], moon_pos[0])
     except Exception as e:
         print(f"Ошибка в _calculate_moon_phase: {e}")
-        return {
-            "angle": 0.0,
-            "phase_name": "Ошибка",
-            "sun_longitude": 0.0,
-            "moon_longitude": 0.0
-        }
+        return dict(_MOON_PHASE_ERROR)
 
 
 async def get_planets(dt: datetime, lat: float, lon: float, extra: bool = False) -> Dict:
@@ -370,16 +472,57 @@ async def get_planets(dt: datetime, lat: float, lon: float, extra: bool = False)
 
 def _calculate_planets_sync(dt: datetime, lat: float, lon: float, extra: bool = False) -> Dict:
     """Синхронная версия вычисления планет"""
+    return _calculate_planets_at_jd(dt, None, lat, lon, extra)[0]
+
+
+def _calculate_planets_at_jd(dt: datetime, jd: Optional[float], lat: float, lon: float,
+                             extra: bool = False) -> Tuple[Dict, FrozenSet[str]]:
+    """
+    Вычисление планет по уже известной юлианской дате (None — вычисляется из dt).
+    Кроме ответа возвращает имена тел, для которых calc_ut завершился ошибкой:
+    их долгота в ответе записана как 0.0
+    """
     try:
-        jd = _datetime_to_jd(dt)
+        _ensure_ephemeris()
+        if jd is None:
+            jd = _datetime_to_jd(dt)
         
+        # Дополнительные точки идут после основных планет
+        if extra:
+            names, planet_ids = _ALL_NAMES, _ALL_IDS
+        else:
+            names, planet_ids = _MAIN_NAMES, _MAIN_IDS
+
+        # Локальные ссылки для цикла по телам
+        calc_ut = swe.calc_ut
+        fixed_illumination = _FIXED_ILLUMINATION
+        longitudes = []
+        retrogrades = []
+        illuminations = []
+        failed = set()
+        for name, planet_id in zip(names, planet_ids):
+            # Одна пара вызовов Swiss Ephemeris на тело: calc_ut и при
+            # необходимости pheno_ut (см. _calculate_planet_position)
+            try:
+                position = calc_ut(jd, planet_id)[0]
+                longitudes.append(position[0])
+                retrogrades.append(position[3] < 0)
+            except Exception:
+                longitudes.append(0.0)
+                retrogrades.append(False)
+                failed.add(name)
+
+            if planet_id in fixed_illumination:
+                illuminations.append(fixed_illumination[planet_id])
+            else:
+                illuminations.append(_get_illumination_percent(planet_id, jd))
+
+        # Знаки всех тел определяются одним вызовом
+        signs = degrees_to_sign_and_degrees_batch(longitudes)
+
         planets_data = {}
-        
-        # Основные планеты
-        for name, planet_id in MAIN_PLANETS.items():
-            longitude, speed, retrograde = _calculate_planet_position(planet_id, jd)
-            sign_name, degrees_in_sign = degrees_to_sign_and_degrees(longitude)
-            illumination = _get_illumination_percent(planet_id, jd)
+        for name, longitude, (sign_name, degrees_in_sign), retrograde, illumination in zip(
+                names, longitudes, signs, retrogrades, illuminations):
             planets_data[name] = {
                 "name": name,
                 "longitude": round(longitude, 6),
@@ -388,28 +531,13 @@ def _calculate_planets_sync(dt: datetime, lat: float, lon: float, extra: bool =
                 "retrograde": retrograde,
                 "illumination_percent": illumination,
             }
-
-        # Дополнительные точки
-        if extra:
-            for name, point_id in EXTRA_POINTS.items():
-                longitude, speed, retrograde = _calculate_planet_position(point_id, jd)
-                sign_name, degrees_in_sign = degrees_to_sign_and_degrees(longitude)
-                illumination = _get_illumination_percent(point_id, jd)
-                planets_data[name] = {
-                    "name": name,
-                    "longitude": round(longitude, 6),
-                    "sign": sign_name,
-                    "degrees_in_sign": round(degrees_in_sign, 2),
-                    "retrograde": retrograde,
-                    "illumination_percent": illumination,
-                }
         
         return {
             "datetime": dt.isoformat(),
             "latitude": lat,
             "longitude": lon,
             "planets": planets_data
-        }
+        }, frozenset(failed)
         
     except Exception as e:
         return {
@@ -418,24 +546,98 @@ def _calculate_planets_sync(dt: datetime, lat: float, lon: float, extra: bool =
             "latitude": lat,
             "longitude": lon,
             "planets": {}
-        }
+        }, frozenset()
 
 
-async def get_aspects(dt: datetime, lat: float, lon: float) -> Dict:
-    """Получает аспекты между планетами"""
-    # Сначала получаем планеты
-    planets_data = await get_planets(dt, lat, lon, extra=True)
+# Максимум моментов в одном запросе ряда: весь ряд занимает один поток
+# executor, и без ограничения мелкий шаг на длинном интервале держал бы его
+# сколь угодно долго
+RANGE_MAX_STEPS = 1000
+
+
+def _calculate_planets_range_sync(dt_start: datetime, dt_end: datetime, step: timedelta,
+                                  lat: float, lon: float, extra: bool = False) -> List[Dict]:
+    """
+    Синхронный расчёт планет для ряда моментов времени [dt_start, dt_end) с шагом step.
+    Весь ряд считается в одной задаче executor вместо отдельной задачи на каждый момент.
+    """
+    if step <= timedelta(0):
+        raise ValueError("Шаг должен быть положительным")
+    steps = -((dt_start - dt_end) // step)  # округление вверх
+    if steps > RANGE_MAX_STEPS:
+        raise ValueError(f"Слишком много моментов в ряду: {steps} (максимум {RANGE_MAX_STEPS})")
     
-    if "error" in planets_data:
-        return planets_data
+    results = []
+    dt = dt_start
+    while dt < dt_end:
+        results.append(_calculate_planets_sync(dt, lat, lon, extra))
+        dt += step
+    return results
+
+
+async def get_planets_range(dt_start: datetime, dt_end: datetime, step: timedelta,
+                            lat: float, lon: float, extra: bool = False) -> List[Dict]:
+    """
+    Получает позиции планет для ряда моментов времени (например, по часам за сутки)
     
-    # Вычисляем аспекты в отдельном потоке
+    Args:
+        dt_start: Начало интервала (включительно)
+        dt_end: Конец интервала (не включительно)
+        step: Шаг по времени
+        lat: Широта
+        lon: Долгота
+        extra: Включить дополнительные точки
+        
+    Returns:
+        List: Позиции планет на каждый момент в формате get_planets
+        
+    Raises:
+        ValueError: Неположительный шаг или больше RANGE_MAX_STEPS моментов
+    """
     loop = asyncio.get_event_loop()
-    aspects = await loop.run_in_executor(
+    return await loop.run_in_executor(
         executor,
-        _calculate_aspects,
-        planets_data["planets"]
+        _calculate_planets_range_sync,
+        dt_start, dt_end, step, lat, lon, extra
     )
+
+
+def _calculate_planets_and_aspects_sync(dt: datetime, lat: float, lon: float) -> Tuple[Dict, List[Dict]]:
+    """Синхронный расчёт планет (с дополнительными точками) и аспектов за один вызов"""
+    planets_data = _calculate_planets_sync(dt, lat, lon, True)
+    if "error" in planets_data:
+        return planets_data, []
+    return planets_data, _calculate_aspects(planets_data["planets"])
+
+
+async def get_aspects(dt: datetime, lat: float, lon: float) -> Dict:
+    """Получает аспекты между планетами"""
+    loop = asyncio.get_event_loop()
+    cache_key = _get_cache_key(dt, lat, lon, True)
+    planets_data = _get_from_cache(cache_key)
+    
+    if planets_data:
+        if "error" in planets_data:
+            return planets_data
+        
+        # Планеты уже в кеше - вычисляем только аспекты
+        aspects = await loop.run_in_executor(
+            executor,
+            _calculate_aspects,
+            planets_data["planets"]
+        )
+    else:
+        # Планеты и аспекты считаются в одной задаче executor,
+        # промежуточный результат сохраняется в кеш планет
+        planets_data, aspects = await loop.run_in_executor(
+            executor,
+            _calculate_planets_and_aspects_sync,
+            dt, lat, lon
+        )
+        _save_to_cache(cache_key, planets_data)
+        
+        if "error" in planets_data:
+            return planets_data
     
     return {
         "datetime": dt.isoformat(),
@@ -474,8 +676,8 @@ async def get_moon_phase(dt: datetime) -> Dict:
     loop = asyncio.get_event_loop()
     moon_data = await loop.run_in_executor(
         executor,
-        _calculate_moon_phase_sync,
-        dt
+        _calculate_moon_phase,
+        _datetime_to_jd(dt)
     )
     
     return {
@@ -484,20 +686,105 @@ async def get_moon_phase(dt: datetime) -> Dict:
     }
 
 
-def initialize_ephemeris():
+def _calculate_full_chart_sync(dt: datetime, lat: float, lon: float) -> Dict:
+    """
+    Синхронный расчёт полной карты: планеты (с дополнительными точками), аспекты,
+    дома и фаза Луны в одной задаче. Юлианская дата вычисляется один раз,
+    фаза Луны берётся из уже рассчитанных долгот Солнца и Луны без повторных
+    вызовов swe.calc_ut
+    """
+    jd = _datetime_to_jd(dt)
+    planets_data, failed = _calculate_planets_at_jd(dt, jd, lat, lon, True)
+    if "error" in planets_data:
+        return planets_data
+    
+    planets = planets_data["planets"]
+    aspects = _calculate_aspects(planets)
+    houses, house_system = _calculate_houses(jd, lat, lon)
+    
+    # Без позиции Солнца или Луны фаза не определена: тот же ответ, что у /moon_phase
+    if "Sun" in failed or "Moon" in failed:
+        moon_phase = dict(_MOON_PHASE_ERROR)
+    else:
+        moon_phase = _moon_phase_from_longitudes(
+            planets["Sun"]["longitude"], planets["Moon"]["longitude"]
+        )
+    
+    return {
+        "datetime": dt.isoformat(),
+        "latitude": lat,
+        "longitude": lon,
+        "planets": planets,
+        "aspects": aspects,
+        "house_system": house_system,
+        "houses": houses,
+        "moon_phase": moon_phase
+    }
+
+
+async def get_full_chart(dt: datetime, lat: float, lon: float) -> Dict:
+    """
+    Получает планеты, аспекты, дома и фазу Луны одним расчётом
+    
+    Args:
+        dt: Время
+        lat: Широта
+        lon: Долгота
+        
+    Returns:
+        Dict: Объединённый ответ /planets (extra), /aspects, /houses и /moon_phase
+    """
+    loop = asyncio.get_event_loop()
+    result = await loop.run_in_executor(
+        executor,
+        _calculate_full_chart_sync,
+        dt, lat, lon
+    )
+    
+    # Планеты попадают в тот же кеш, что и у get_planets(extra=True)
+    if "error" not in result:
+        _save_to_cache(_get_cache_key(dt, lat, lon, True), {
+            "datetime": result["datetime"],
+            "latitude": lat,
+            "longitude": lon,
+            "planets": result["planets"]
+        })
+    
+    return result
+
+
+def _warmup_ephemeris() -> None:
+    """
+    Пробный расчёт на J2000 при старте: Swiss Ephemeris лениво открывает файлы
+    эфемерид и заполняет внутренние таблицы при первом обращении к телу,
+    поэтому задержка холодного старта ложится на запуск, а не на первый запрос
+    """
+    warmup_dt = datetime(2000, 1, 1, 12, 0)
+    planets_data, _ = _calculate_planets_and_aspects_sync(warmup_dt, 0.0, 0.0)
+    _calculate_houses(_datetime_to_jd(warmup_dt), 0.0, 0.0)
+    if "error" in planets_data:
+        print(f"Предупреждение: пробный расчёт эфемерид не удался: {planets_data['error']}")
+
+
+def initialize_ephemeris() -> None:
     """Инициализирует Swiss Ephemeris при старте"""
+    global _ephemeris_initialized
     try:
         # Устанавливаем путь к эфемеридным файлам
         swe.set_ephe_path()
+        _ephemeris_initialized = True
+        _warmup_ephemeris()
         print("Swiss Ephemeris инициализирован успешно")
     except Exception as e:
         print(f"Ошибка инициализации Swiss Ephemeris: {e}")
 
 
-def cleanup_ephemeris():
+def cleanup_ephemeris() -> None:
     """Очищает ресурсы Swiss Ephemeris"""
+    global _ephemeris_initialized
     try:
         swe.close()
+        _ephemeris_initialized = False
         print("Swiss Ephemeris закрыт")
     except Exception as e:
         print(f"Ошибка при закрытии Swiss Ephemeris: {e}")
@@ -3,9 +3,14 @@
 """
 
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import os
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional, Tuple
 import math
 
 try:
@@ -14,10 +19,85 @@ except ImportError:
     print("Предупреждение: библиотека kerykeion не установлена")
     AstrologicalSubject = None
 
+try:
+    from timezonefinder import TimezoneFinder
+except ImportError:
+    TimezoneFinder = None
+
 from utils.zodiac import degrees_to_sign_and_degrees
 
-# Глобальный executor для синхронных вычислений
-executor = ThreadPoolExecutor(max_workers=2)
+
+def _warmup_worker():
+    """
+    Инициализатор процесса пула: пробный расчёт субъекта загружает модули
+    kerykeion и файлы эфемерид, поэтому первый запрос к воркеру не платит
+    за холодный старт
+    """
+    try:
+        from services.astrology_calculations import AspectCalculator  # noqa: F401
+
+        if AstrologicalSubject is not None:
+            AstrologicalSubject(
+                name="Warmup", year=2000, month=1, day=1, hour=12, minute=0,
+                city="Moscow", nation="RU", lat=55.7558, lng=37.6173,
+                tz_str="Europe/Moscow"
+            )
+    except Exception as e:
+        print(f"Предупреждение: прогрев процесса натальных карт не удался: {e}")
+
+
+# Верхняя граница числа процессов по умолчанию: каждый воркер держит
+# в памяти свою копию kerykeion и эфемерид
+NATAL_CHART_MAX_DEFAULT_WORKERS = 8
+
+
+def _default_worker_count() -> int:
+    """
+    Число процессов пула по умолчанию: доступные процессу ядра (в контейнере
+    os.cpu_count() возвращает ядра хоста), но не больше NATAL_CHART_MAX_DEFAULT_WORKERS
+    """
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity есть не на всех платформах (macOS, Windows)
+        available = os.cpu_count() or 1
+    return max(1, min(available, NATAL_CHART_MAX_DEFAULT_WORKERS))
+
+
+# Глобальный executor для синхронных вычислений.
+# Построение AstrologicalSubject в kerykeion — чистый Python и держит GIL,
+# поэтому карты считаются в пуле процессов; размер переопределяется
+# переменной NATAL_CHART_WORKERS. Процессы запускаются при первом запросе
+# и прогреваются в _warmup_worker
+NATAL_CHART_WORKERS = int(os.getenv("NATAL_CHART_WORKERS", 0)) or _default_worker_count()
+
+
+def _create_executor() -> ProcessPoolExecutor:
+    """Создаёт пул процессов для расчёта натальных карт"""
+    return ProcessPoolExecutor(max_workers=NATAL_CHART_WORKERS, initializer=_warmup_worker)
+
+
+executor = _create_executor()
+
+
+def _restart_executor(broken: ProcessPoolExecutor):
+    """
+    Пересоздаёт пул после аварийного завершения воркера (BrokenProcessPool).
+    Пул заменяется только если он всё ещё тот, что сломался: несколько
+    одновременных запросов получают ошибку от одного и того же пула
+    """
+    global executor
+    if executor is broken:
+        print("Предупреждение: пул процессов натальных карт аварийно завершился, пересоздаём")
+        executor = _create_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+# Кеш готовых карт на стороне основного процесса: отвечает на повторные
+# запросы без обращения к пулу. Воркеры результаты не кешируют, иначе
+# каждый из них держал бы ещё по копии тех же карт
+CHART_CACHE_MAX_SIZE = 4096
+_chart_cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
 
 # Соответствие планет и их символов
 PLANET_SYMBOLS = {
@@ -53,6 +133,29 @@ ZODIAC_SYMBOLS = {
     "Pisces": "♓"
 }
 
+# Сокращения знаков kerykeion и их полные названия
+_SIGN_ABBREV_MAP = {
+    "Ari": "Aries", "Tau": "Taurus", "Gem": "Gemini",
+    "Can": "Cancer", "Leo": "Leo", "Vir": "Virgo",
+    "Lib": "Libra", "Sco": "Scorpio", "Sag": "Sagittarius",
+    "Cap": "Capricorn", "Aqu": "Aquarius", "Pis": "Pisces"
+}
+
+# Стихии знаков зодиака
+_SIGN_TO_ELEMENT = {
+    "Aries": "Fire", "Leo": "Fire", "Sagittarius": "Fire",
+    "Taurus": "Earth", "Virgo": "Earth", "Capricorn": "Earth",
+    "Gemini": "Air", "Libra": "Air", "Aquarius": "Air",
+    "Cancer": "Water", "Scorpio": "Water", "Pisces": "Water"
+}
+
+# Качества (кресты) знаков зодиака
+_SIGN_TO_QUALITY = {
+    "Aries": "Cardinal", "Cancer": "Cardinal", "Libra": "Cardinal", "Capricorn": "Cardinal",
+    "Taurus": "Fixed", "Leo": "Fixed", "Scorpio": "Fixed", "Aquarius": "Fixed",
+    "Gemini": "Mutable", "Virgo": "Mutable", "Sagittarius": "Mutable", "Pisces": "Mutable"
+}
+
 # Соответствие домов и их значений
 HOUSE_MEANINGS = {
     1: "Личность, внешность, первые впечатления",
@@ -69,6 +172,154 @@ HOUSE_MEANINGS = {
     12: "Подсознание, скрытые враги, духовность, изоляция"
 }
 
+# Значения домов по номеру дома (индекс 0 не используется)
+_HOUSE_MEANINGS_LIST = ("",) + tuple(HOUSE_MEANINGS[i] for i in range(1, 13))
+
+
+def _build_natal_chart(year: int, month: int, day: int,
+                       hour: int, minute: int, city: str,
+                       nation: str, lat: float, lon: float, tz_str: str) -> Dict:
+    """
+    Рассчитывает натальную карту по параметрам рождения
+
+    При ошибке исключение пробрасывается вызывающему.
+    """
+    if AstrologicalSubject is None:
+        raise ImportError("Библиотека kerykeion не установлена")
+        
+    # Создаём астрологический субъект
+    subject = AstrologicalSubject(
+        name="Anonymous",  # Используем анонимное имя
+        year=year,
+        month=month,
+        day=day,
+        hour=hour,
+        minute=minute,
+        city=city,
+        nation=nation,
+        lat=lat,
+        lng=lon,
+        tz_str=tz_str
+    )
+    
+    # Локальные ссылки на справочники для циклов ниже
+    sign_abbrev_get = _SIGN_ABBREV_MAP.get
+    zodiac_symbol_get = ZODIAC_SYMBOLS.get
+    planet_symbol_get = PLANET_SYMBOLS.get
+    get_element = _get_element_by_sign
+    get_quality = _get_quality_by_sign
+    
+    # Получаем данные о планетах
+    planets_data = {}
+    # Долготы, стихии и качества собираются колонками за тот же проход:
+    # по ним считаются аспекты и распределения без повторного обхода планет
+    planet_longitudes = []
+    planet_elements = []
+    planet_qualities = []
+    for planet in subject.planets_list:
+        planet_name = planet.name
+        # Получаем полное название знака
+        sign_full = sign_abbrev_get(planet.sign, planet.sign)
+        longitude = round(planet.abs_pos, 6)
+        element = get_element(sign_full)
+        quality = get_quality(sign_full)
+        planet_longitudes.append(longitude)
+        planet_elements.append(element)
+        planet_qualities.append(quality)
+        
+        planet_info = {
+            "name": planet_name,
+            "longitude": longitude,
+            "sign": sign_full,
+            "sign_symbol": zodiac_symbol_get(sign_full, ""),
+            "degrees_in_sign": round(planet.position, 2),
+            "house": getattr(planet, "house", 0),
+            "retrograde": getattr(planet, "retrograde", False),
+            "symbol": planet_symbol_get(planet_name, ""),
+            "element": element,
+            "quality": quality
+        }
+        planets_data[planet_name] = planet_info
+    
+    # Получаем данные о домах
+    houses_data = []
+    houses_list = subject.houses_list
+    # Все дома в houses_list одного типа, поэтому атрибут долготы
+    # определяется один раз по первому дому
+    if houses_list and hasattr(houses_list[0], 'abs_pos'):
+        get_longitude = attrgetter('abs_pos')
+    else:
+        # Если нет abs_pos, используем degree_ut
+        get_longitude = attrgetter('degree_ut')
+    for i, house in enumerate(houses_list, 1):
+        longitude = get_longitude(house)
+        
+        sign_name, degrees_in_sign = degrees_to_sign_and_degrees(longitude)
+        house_info = {
+            "house": i,
+            "longitude": round(longitude, 6),
+            "sign": sign_name,
+            "sign_symbol": zodiac_symbol_get(sign_name, ""),
+            "degrees_in_sign": round(degrees_in_sign, 2),
+            "meaning": _HOUSE_MEANINGS_LIST[i],
+            "element": get_element(sign_name),
+            "quality": get_quality(sign_name)
+        }
+        houses_data.append(house_info)
+    
+    # Рассчитываем аспекты между планетами
+    from services.astrology_calculations import AspectCalculator, PlanetTable
+    planets_table = PlanetTable(
+        names=tuple(planets_data),
+        longitudes=tuple(planet_longitudes),
+        speeds=(0.0,) * len(planet_longitudes)
+    )
+    aspects_data = AspectCalculator.calculate_aspects(planets_table)
+    
+
+    
+    return {
+        "subject_info": {
+            "birth_date": f"{year}-{month:02d}-{day:02d}",
+            "birth_time": f"{hour:02d}:{minute:02d}",
+            "location": f"{city}, {nation}",
+            "coordinates": f"{lat:.4f}, {lon:.4f}",
+            "timezone": tz_str
+        },
+        "planets": planets_data,
+        "houses": houses_data,
+        "aspects": aspects_data,
+        "statistics": {
+            "planets_count": len(planets_data),
+            "aspects_count": len(aspects_data),
+            "major_aspects_count": sum(1 for aspect in aspects_data if aspect["is_major"]),
+            "elements_distribution": _calculate_elements_distribution(planet_elements),
+            "qualities_distribution": _calculate_qualities_distribution(planet_qualities)
+        }
+    }
+
+
+def _copy_chart(chart: Dict) -> Dict:
+    """
+    Копирует закешированную карту для выдачи наружу
+
+    Листья карты — неизменяемые скаляры (строки, числа, bool), поэтому
+    достаточно скопировать контейнеры: copy.deepcopy обходил бы каждое
+    значение и вёл memo-словарь
+    """
+    statistics = chart["statistics"]
+    return {
+        "subject_info": dict(chart["subject_info"]),
+        "planets": {name: dict(info) for name, info in chart["planets"].items()},
+        "houses": [dict(house) for house in chart["houses"]],
+        "aspects": [dict(aspect) for aspect in chart["aspects"]],
+        "statistics": {
+            **statistics,
+            "elements_distribution": dict(statistics["elements_distribution"]),
+            "qualities_distribution": dict(statistics["qualities_distribution"])
+        }
+    }
+
 
 def _calculate_natal_chart_sync(year: int, month: int, day: int, 
                                hour: int, minute: int, city: str, 
@@ -93,105 +344,13 @@ def _calculate_natal_chart_sync(year: int, month: int, day: int,
         Dict: Данные натальной карты
     """
     try:
-        if AstrologicalSubject is None:
-            raise ImportError("Библиотека kerykeion не установлена")
-            
-        # Создаём астрологический субъект
-        subject = AstrologicalSubject(
-            name="Anonymous",  # Используем анонимное имя
-            year=year,
-            month=month,
-            day=day,
-            hour=hour,
-            minute=minute,
-            city=city,
-            nation=nation,
-            lat=lat,
-            lng=lon,
-            tz_str=tz_str
+        return _build_natal_chart(
+            year, month, day, hour, minute, city, nation, lat, lon, tz_str
         )
-        
-        # Получаем данные о планетах
-        planets_data = {}
-        for planet in subject.planets_list:
-            planet_name = planet.name
-            # Получаем полное название знака
-            sign_map = {
-                "Ari": "Aries", "Tau": "Taurus", "Gem": "Gemini", 
-                "Can": "Cancer", "Leo": "Leo", "Vir": "Virgo",
-                "Lib": "Libra", "Sco": "Scorpio", "Sag": "Sagittarius",
-                "Cap": "Capricorn", "Aqu": "Aquarius", "Pis": "Pisces"
-            }
-            sign_full = sign_map.get(planet.sign, planet.sign)
-            
-            planet_info = {
-                "name": planet_name,
-                "longitude": round(planet.abs_pos, 6),
-                "sign": sign_full,
-                "sign_symbol": ZODIAC_SYMBOLS.get(sign_full, ""),
-                "degrees_in_sign": round(planet.position, 2),
-                "house": getattr(planet, "house", 0),
-                "retrograde": getattr(planet, "retrograde", False),
-                "symbol": PLANET_SYMBOLS.get(planet_name, ""),
-                "element": _get_element_by_sign(sign_full),
-                "quality": _get_quality_by_sign(sign_full)
-            }
-            planets_data[planet_name] = planet_info
-        
-        # Получаем данные о домах
-        houses_data = []
-        houses_list = subject.houses_list
-        for i, house in enumerate(houses_list, 1):
-            if hasattr(house, 'abs_pos'):
-                longitude = house.abs_pos
-            else:
-                # Если нет abs_pos, используем degree_ut
-                longitude = getattr(house, 'degree_ut', 0)
-            
-            sign_name, degrees_in_sign = degrees_to_sign_and_degrees(longitude)
-            house_info = {
-                "house": i,
-                "longitude": round(longitude, 6),
-                "sign": sign_name,
-                "sign_symbol": ZODIAC_SYMBOLS.get(sign_name, ""),
-                "degrees_in_sign": round(degrees_in_sign, 2),
-                "meaning": HOUSE_MEANINGS.get(i, ""),
-                "element": _get_element_by_sign(sign_name),
-                "quality": _get_quality_by_sign(sign_name)
-            }
-            houses_data.append(house_info)
-        
-        # Рассчитываем аспекты между планетами
-        from services.astrology_calculations import AspectCalculator
-        aspects_data = AspectCalculator.calculate_aspects(planets_data)
-        
-
-        
-        return {
-            "subject_info": {
-                "birth_date": f"{year}-{month:02d}-{day:02d}",
-                "birth_time": f"{hour:02d}:{minute:02d}",
-                "location": f"{city}, {nation}",
-                "coordinates": f"{lat:.4f}, {lon:.4f}",
-                "timezone": tz_str
-            },
-            "planets": planets_data,
-            "houses": houses_data,
-            "aspects": aspects_data,
-            "statistics": {
-                "planets_count": len(planets_data),
-                "aspects_count": len(aspects_data),
-                "major_aspects_count": len([a for a in aspects_data if a["is_major"]]),
-                "elements_distribution": _calculate_elements_distribution(planets_data),
-                "qualities_distribution": _calculate_qualities_distribution(planets_data)
-            }
-        }
-        
     except Exception as e:
         return {
             "error": str(e),
             "subject_info": {
-                "name": name,
                 "birth_date": f"{year}-{month:02d}-{day:02d}",
                 "birth_time": f"{hour:02d}:{minute:02d}",
                 "location": f"{city}, {nation}",
@@ -210,37 +369,12 @@ def _calculate_natal_chart_sync(year: int, month: int, day: int,
 
 def _get_element_by_sign(sign: str) -> str:
     """Возвращает стихию знака зодиака"""
-    fire_signs = ["Aries", "Leo", "Sagittarius"]
-    earth_signs = ["Taurus", "Virgo", "Capricorn"]
-    air_signs = ["Gemini", "Libra", "Aquarius"] 
-    water_signs = ["Cancer", "Scorpio", "Pisces"]
-    
-    if sign in fire_signs:
-        return "Fire"
-    elif sign in earth_signs:
-        return "Earth"
-    elif sign in air_signs:
-        return "Air"
-    elif sign in water_signs:
-        return "Water"
-    else:
-        return "Unknown"
+    return _SIGN_TO_ELEMENT.get(sign, "Unknown")
 
 
 def _get_quality_by_sign(sign: str) -> str:
     """Возвращает качество знака зодиака"""
-    cardinal_signs = ["Aries", "Cancer", "Libra", "Capricorn"]
-    fixed_signs = ["Taurus", "Leo", "Scorpio", "Aquarius"]
-    mutable_signs = ["Gemini", "Virgo", "Sagittarius", "Pisces"]
-    
-    if sign in cardinal_signs:
-        return "Cardinal"
-    elif sign in fixed_signs:
-        return "Fixed"
-    elif sign in mutable_signs:
-        return "Mutable"
-    else:
-        return "Unknown"
+    return _SIGN_TO_QUALITY.get(sign, "Unknown")
 
 
 
@@ -249,28 +383,16 @@ def _get_quality_by_sign(sign: str) -> str:
 
 
 
-def _calculate_elements_distribution(planets_data: Dict) -> Dict:
+def _calculate_elements_distribution(elements: Iterable[str]) -> Dict:
     """Рассчитывает распределение планет по стихиям"""
-    elements = {"Fire": 0, "Earth": 0, "Air": 0, "Water": 0}
-    
-    for planet_info in planets_data.values():
-        element = planet_info.get("element")
-        if element in elements:
-            elements[element] += 1
-    
-    return elements
+    counts = Counter(elements)
+    return {element: counts[element] for element in ("Fire", "Earth", "Air", "Water")}
 
 
-def _calculate_qualities_distribution(planets_data: Dict) -> Dict:
+def _calculate_qualities_distribution(qualities: Iterable[str]) -> Dict:
     """Рассчитывает распределение планет по качествам"""
-    qualities = {"Cardinal": 0, "Fixed": 0, "Mutable": 0}
-    
-    for planet_info in planets_data.values():
-        quality = planet_info.get("quality")
-        if quality in qualities:
-            qualities[quality] += 1
-    
-    return qualities
+    counts = Counter(qualities)
+    return {quality: counts[quality] for quality in ("Cardinal", "Fixed", "Mutable")}
 
 
 async def calculate_natal_chart(year: int, month: int, day: int,
@@ -295,21 +417,50 @@ async def calculate_natal_chart(year: int, month: int, day: int,
     Returns:
         Dict: Данные натальной карты
     """
+    key = (year, month, day, hour, minute, city, nation, lat, lon, tz_str)
+    cached = _chart_cache.get(key)
+    if cached is not None:
+        _chart_cache.move_to_end(key)
+        return _copy_chart(cached)
+
     loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(
-        executor,
-        _calculate_natal_chart_sync,
-        year, month, day, hour, minute, city, nation, lat, lon, tz_str
-    )
-    
+    pool = executor
+    try:
+        result = await loop.run_in_executor(pool, _calculate_natal_chart_sync, *key)
+    except BrokenProcessPool:
+        # Воркер упал (например, убит по OOM) — пул больше не принимает задачи.
+        # Пересоздаём его и повторяем расчёт один раз
+        _restart_executor(pool)
+        result = await loop.run_in_executor(executor, _calculate_natal_chart_sync, *key)
+
+    # Ошибки не кешируем, чтобы повторный запрос мог пройти успешно
+    if "error" not in result:
+        _chart_cache[key] = result
+        if len(_chart_cache) > CHART_CACHE_MAX_SIZE:
+            _chart_cache.popitem(last=False)
+        result = _copy_chart(result)
+
     return result
 
 
+@lru_cache(maxsize=1)
+def _get_timezone_finder() -> "TimezoneFinder":
+    """Создаёт TimezoneFinder один раз (полигоны загружаются в память)"""
+    return TimezoneFinder(in_memory=True)
+
+
 def get_timezone_by_coordinates(lat: float, lon: float) -> str:
     """
-    Простая функция для определения часового пояса по координатам
-    В реальном проекте стоит использовать библиотеку timezonefinder
+    Определяет часовой пояс (IANA) по координатам
+
+    Использует timezonefinder, если библиотека установлена; иначе
+    применяется простое приближение с UTC по умолчанию
     """
+    if TimezoneFinder is not None:
+        tz_str = _get_timezone_finder().timezone_at(lng=lon, lat=lat)
+        if tz_str:
+            return tz_str
+
     # Простое приближение на основе долготы
     utc_offset = round(lon / 15)
     
@@ -331,34 +482,31 @@ def validate_birth_data(year: int, month: int, day: int, hour: int, minute: int)
     Returns:
         Tuple[bool, str]: (is_valid, error_message)
     """
+    # Проверяем год
+    current_year = datetime.now().year
+    if not (1900 <= year <= current_year):
+        return False, f"Год должен быть между 1900 и {current_year}"
+    
+    # Проверяем месяц
+    if not (1 <= month <= 12):
+        return False, "Месяц должен быть между 1 и 12"
+    
+    # Проверяем день
+    if not (1 <= day <= 31):
+        return False, "День должен быть между 1 и 31"
+    
+    # Проверяем час
+    if not (0 <= hour <= 23):
+        return False, "Час должен быть между 0 и 23"
+    
+    # Проверяем минуту
+    if not (0 <= minute <= 59):
+        return False, "Минута должна быть между 0 и 59"
+    
+    # Проверяем валидность даты
     try:
-        # Проверяем год
-        if not (1900 <= year <= datetime.now().year):
-            return False, f"Год должен быть между 1900 и {datetime.now().year}"
-        
-        # Проверяем месяц
-        if not (1 <= month <= 12):
-            return False, "Месяц должен быть между 1 и 12"
-        
-        # Проверяем день
-        if not (1 <= day <= 31):
-            return False, "День должен быть между 1 и 31"
-        
-        # Проверяем час
-        if not (0 <= hour <= 23):
-            return False, "Час должен быть между 0 и 23"
-        
-        # Проверяем минуту
-        if not (0 <= minute <= 59):
-            return False, "Минута должна быть между 0 и 59"
-        
-        # Проверяем валидность даты
-        try:
-            datetime(year, month, day, hour, minute)
-        except ValueError as e:
-            return False, f"Невалидная дата: {str(e)}"
-        
-        return True, ""
-        
-    except Exception as e:
-        return False, f"Ошибка валидации: {str(e)}"
+        datetime(year, month, day, hour, minute)
+    except ValueError as e:
+        return False, f"Невалидная дата: {str(e)}"
+    
+    return True, ""
@@ -0,0 +1,108 @@
+"""
+Тесты для астрологических калькуляторов
+"""
+
+import random
+
+import pytest
+
+from services.astrology_calculations import (
+    AspectCalculator,
+    AspectResult,
+    AstrologicalUtilities,
+    PlanetTable,
+    SynastryContext,
+    _ASPECT_TEMPLATES,
+    _match_aspect,
+)
+
+PLANET_NAMES = ("Sun", "Moon", "Mercury", "Venus", "Mars",
+                "Jupiter", "Saturn", "Uranus", "Neptune", "Pluto")
+
+
+def _reference_aspect(angle_diff: float):
+    """Точная классификация без квантования: первый аспект, в орб которого попадает угол"""
+    for aspect_id, template in enumerate(_ASPECT_TEMPLATES):
+        orb = abs(angle_diff - template[1])
+        if orb <= template[2]:
+            return aspect_id, orb
+    return None
+
+
+def _random_planets(rng: random.Random) -> dict:
+    """Случайная карта в формате словаря планет"""
+    return {
+        name: {"longitude": rng.uniform(0, 360), "speed": rng.uniform(-1, 1)}
+        for name in PLANET_NAMES
+    }
+
+
+class TestAspectClassification:
+    """Тесты классификации аспектов с кешем по квантованному углу"""
+
+    @pytest.mark.parametrize("aspect_angle,orb", [(0, 8), (60, 6), (90, 8), (120, 8), (150, 3), (180, 8)])
+    def test_orb_boundaries_around_quantization_step(self, aspect_angle, orb):
+        """Тест: углы в пределах шага квантования (0.01°) от границы орба"""
+        for delta in (-0.006, -0.004, -1e-9, 0.0, 1e-9, 0.004, 0.006):
+            for edge in (aspect_angle - orb, aspect_angle + orb):
+                angle_diff = edge + delta
+                if not 0 <= angle_diff <= 180:
+                    continue
+                assert _match_aspect(angle_diff) == _reference_aspect(angle_diff), angle_diff
+
+    def test_matches_exact_classification_on_grid(self):
+        """Тест: на частой сетке углов результат совпадает с точной классификацией"""
+        angle_diff = 0.0
+        while angle_diff <= 180.0:
+            assert _match_aspect(angle_diff) == _reference_aspect(angle_diff), angle_diff
+            angle_diff += 0.0037
+
+    def test_find_aspects_matches_calculate_aspects(self):
+        """Тест: find_aspects и AspectResult.to_dict дают те же словари, что calculate_aspects"""
+        planets = _random_planets(random.Random(7))
+
+        results = AspectCalculator.find_aspects(planets)
+        aspects = AspectCalculator.calculate_aspects(planets)
+
+        assert all(isinstance(result, AspectResult) for result in results)
+        assert [result.to_dict() for result in results] == aspects
+        assert [result.to_dict(include_description=False) for result in results] == \
+            AspectCalculator.calculate_aspects(planets, include_descriptions=False)
+
+
+class TestSynastryContext:
+    """Тесты пакетного расчёта совместимости"""
+
+    def test_score_many_matches_compare(self):
+        """Тест: score_many совпадает с баллами повторных вызовов compare"""
+        rng = random.Random(42)
+        person1 = _random_planets(rng)
+        others = [_random_planets(rng) for _ in range(20)]
+        context = SynastryContext(person1)
+
+        expected = [context.compare(other)["compatibility_score"] for other in others]
+
+        assert context.score_many(others) == expected
+        # PlanetTable принимается наравне со словарём
+        assert context.score_many([PlanetTable.from_dict(other) for other in others]) == expected
+
+
+class TestRetrogradeMask:
+    """Тесты пакетного определения ретроградности"""
+
+    def test_retrograde_mask_mixed_speeds(self):
+        """Тест: прямое и попятное движение, в том числе через 0°/360°"""
+        longitudes = [10.5, 9.5, 0.5, 359.5, 200.0, 200.0]
+        previous = [10.0, 10.0, 359.5, 0.5, 199.0, 200.0]
+
+        mask = AstrologicalUtilities.retrograde_mask(longitudes, previous)
+
+        assert mask == [False, True, False, True, False, False]
+        assert mask == [
+            AstrologicalUtilities.calculate_retrograde_motion(longitude, prev)
+            for longitude, prev in zip(longitudes, previous)
+        ]
+
+    def test_retrograde_mask_empty(self):
+        """Тест: пустой ввод"""
+        assert AstrologicalUtilities.retrograde_mask([], []) == []
@@ -3,6 +3,7 @@
 """
 
 import pytest
+import asyncio
 from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
 import os
@@ -13,6 +14,7 @@ from utils.auth import (
     APIKey,
     APIKeyManager,
     APIKeyPermission,
+    CONFIG_RELOAD_INTERVAL,
     authenticate_api_key,
     require_permission,
     generate_demo_key
@@ -76,6 +78,10 @@ class TestAPIKey:
         assert expired_key.is_expired() == True
         assert active_key.is_expired() == False
 
+        # Переданное время используется вместо текущего
+        assert active_key.is_expired(now=future_time + timedelta(seconds=1)) == True
+        assert expired_key.is_expired(now=expired_time - timedelta(seconds=1)) == False
+
     def test_api_key_has_permission(self):
         """Тест проверки разрешений"""
         read_key = APIKey(
@@ -210,6 +216,192 @@ class TestAPIKeyManager:
         assert verified_key.key_id == api_key.key_id
         assert verified_key.usage_count == 1  # Увеличен на 1
 
+    def test_verify_key_usage_flushed_later(self):
+        """Тест отложенного сохранения счётчика использования"""
+        raw_key, api_key = self.manager.generate_key("Test Key")
+
+        self.manager.verify_key(raw_key)
+
+        # До сброса в файле остаётся прежнее значение счётчика
+        reloaded = APIKeyManager(config_path=self.temp_file.name)
+        assert reloaded.get_key_by_id(api_key.key_id).usage_count == 0
+
+        self.manager.flush_usage()
+
+        reloaded = APIKeyManager(config_path=self.temp_file.name)
+        assert reloaded.get_key_by_id(api_key.key_id).usage_count == 1
+
+    def test_usage_flush_retried_after_write_error(self, capsys):
+        """Тест: при ошибке записи счётчики остаются несохранёнными и пишутся позже"""
+        raw_key, api_key = self.manager.generate_key("Test Key")
+        self.manager.verify_key(raw_key)
+
+        with patch('utils.auth.os.replace', side_effect=OSError("No space left on device")):
+            self.manager.flush_usage()
+        assert "Ошибка сохранения API ключей" in capsys.readouterr().out
+        assert not os.path.exists(self.temp_file.name + ".tmp")
+
+        reloaded = APIKeyManager(config_path=self.temp_file.name)
+        assert reloaded.get_key_by_id(api_key.key_id).usage_count == 0
+
+        self.manager.flush_usage()
+        reloaded = APIKeyManager(config_path=self.temp_file.name)
+        assert reloaded.get_key_by_id(api_key.key_id).usage_count == 1
+
+    def test_usage_flush_retry_merges_file_changed_meanwhile(self):
+        """Тест: повторное сохранение после ошибки не затирает изменения файла другим менеджером"""
+        raw_key, api_key = self.manager.generate_key("Test Key")
+        self.manager.verify_key(raw_key)
+
+        with patch('utils.auth.os.replace', side_effect=OSError("No space left on device")):
+            self.manager.flush_usage()
+
+        # Пока счётчики не сохранены, файл меняет другой воркер
+        other = APIKeyManager(config_path=self.temp_file.name)
+        other.verify_key(raw_key)
+        other.flush_usage()
+        _, other_key = other.generate_key("Other Key")
+
+        self.manager.flush_usage()
+
+        reloaded = APIKeyManager(config_path=self.temp_file.name)
+        assert reloaded.get_key_by_id(api_key.key_id).usage_count == 2
+        assert reloaded.get_key_by_id(other_key.key_id) is not None
+
+    def test_usage_flush_loop_keeps_revocation(self):
+        """Тест: фоновое сохранение не возвращает ключ, отозванный другим менеджером"""
+        raw_key, api_key = self.manager.generate_key("Test Key")
+        self.manager.verify_key(raw_key)
+        APIKeyManager(config_path=self.temp_file.name).revoke_key(api_key.key_id)
+
+        async def run_one_cycle():
+            task = asyncio.create_task(self.manager.run_usage_flush_loop(interval=0.01))
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        asyncio.run(run_one_cycle())
+
+        reloaded = APIKeyManager(config_path=self.temp_file.name).get_key_by_id(api_key.key_id)
+        assert reloaded.usage_count == 1
+        assert reloaded.is_active is False
+
+    def test_usage_flush_loop(self):
+        """Тест фоновой задачи сохранения счётчиков использования"""
+        raw_key, api_key = self.manager.generate_key("Test Key")
+        self.manager.verify_key(raw_key)
+
+        async def run_one_cycle():
+            task = asyncio.create_task(self.manager.run_usage_flush_loop(interval=0.01))
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        asyncio.run(run_one_cycle())
+
+        reloaded = APIKeyManager(config_path=self.temp_file.name)
+        assert reloaded.get_key_by_id(api_key.key_id).usage_count == 1
+
+    def test_reload_keeps_unsaved_usage_from_each_manager(self):
+        """Тест: перечитывание файла не теряет несохранённые использования"""
+        raw_key, api_key = self.manager.generate_key("Test Key")
+        # Второй менеджер с тем же файлом — как другой воркер
+        other = APIKeyManager(config_path=self.temp_file.name)
+
+        self.manager.verify_key(raw_key)
+        self.manager.verify_key(raw_key)
+        other.verify_key(raw_key)
+
+        other.flush_usage()
+        self.manager._load_keys()
+        assert self.manager.get_key_by_id(api_key.key_id).usage_count == 3
+
+        self.manager.flush_usage()
+        reloaded = APIKeyManager(config_path=self.temp_file.name)
+        assert reloaded.get_key_by_id(api_key.key_id).usage_count == 3
+
+    def test_rate_limit_survives_reload_after_external_write(self):
+        """Тест: изменение файла другим процессом не сбрасывает несохранённый счётчик"""
+        raw_key, api_key = self.manager.generate_key("Test Key", rate_limit=3)
+        for _ in range(3):
+            assert self.manager.verify_key(raw_key) is not None
+        assert self.manager.verify_key(raw_key) is None
+
+        # Счётчики ещё не сохранены, а файл переписывает другой менеджер
+        other = APIKeyManager(config_path=self.temp_file.name)
+        other.generate_key("Other Key")
+
+        self.manager._last_reload_check -= CONFIG_RELOAD_INTERVAL
+        self.manager.reload_if_changed()
+
+        assert self.manager.get_key_by_id(api_key.key_id).usage_count == 3
+        assert self.manager.verify_key(raw_key) is None
+
+    def test_flush_keeps_revocation_from_other_manager(self):
+        """Тест: сохранение счётчиков не возвращает ключ, отозванный другим менеджером"""
+        raw_key, api_key = self.manager.generate_key("Test Key")
+        self.manager.verify_key(raw_key)
+
+        other = APIKeyManager(config_path=self.temp_file.name)
+        assert other.revoke_key(api_key.key_id)
+
+        self.manager.flush_usage()
+
+        reloaded = APIKeyManager(config_path=self.temp_file.name).get_key_by_id(api_key.key_id)
+        assert reloaded.is_active is False
+        assert reloaded.usage_count == 1
+        assert self.manager.verify_key(raw_key) is None
+
+    def test_flush_keeps_key_generated_by_other_manager(self):
+        """Тест: сохранение счётчиков не удаляет ключ, созданный другим менеджером"""
+        raw_key, api_key = self.manager.generate_key("Test Key")
+        self.manager.verify_key(raw_key)
+
+        other = APIKeyManager(config_path=self.temp_file.name)
+        other_raw_key, other_key = other.generate_key("Other Key")
+
+        self.manager.flush_usage()
+
+        reloaded = APIKeyManager(config_path=self.temp_file.name)
+        assert reloaded.get_key_by_id(api_key.key_id).usage_count == 1
+        assert reloaded.get_key_by_id(other_key.key_id) is not None
+        assert reloaded.verify_key(other_raw_key) is not None
+
+    def test_revoke_keeps_changes_from_other_manager(self):
+        """Тест: отзыв ключа не отменяет изменения файла другим менеджером"""
+        raw_key, api_key = self.manager.generate_key("Test Key")
+        other = APIKeyManager(config_path=self.temp_file.name)
+        other.update_key_rate_limit(api_key.key_id, 12345)
+
+        assert self.manager.revoke_key(api_key.key_id)
+
+        reloaded = APIKeyManager(config_path=self.temp_file.name).get_key_by_id(api_key.key_id)
+        assert reloaded.is_active is False
+        assert reloaded.rate_limit == 12345
+
+    def test_load_keys_skips_unchanged_file(self):
+        """Тест повторной загрузки: файл перечитывается только после изменения"""
+        raw_key, api_key = self.manager.generate_key("Test Key")
+        self.manager.verify_key(raw_key)
+
+        # Файл не менялся — счётчик в памяти не перезаписывается значением из файла
+        self.manager._load_keys()
+        assert self.manager.get_key_by_id(api_key.key_id).usage_count == 1
+
+        # Файл изменён другим процессом — изменения подхватываются
+        other = APIKeyManager(config_path=self.temp_file.name)
+        other.update_key_rate_limit(api_key.key_id, 12345)
+        self.manager._load_keys()
+        assert self.manager.get_key_by_id(api_key.key_id).rate_limit == 12345
+
+    def test_reload_if_changed_debounced(self):
+        """Тест: повторная проверка файла ключей не чаще CONFIG_RELOAD_INTERVAL"""
+        with patch.object(self.manager, '_load_keys') as mock_load:
+            self.manager.reload_if_changed()
+            mock_load.assert_not_called()
+
+            self.manager._last_reload_check -= CONFIG_RELOAD_INTERVAL
+            self.manager.reload_if_changed()
+            mock_load.assert_called_once()
+
     def test_verify_key_failure(self):
         """Тест неудачной верификации ключа"""
         # Пытаемся верифицировать несуществующий ключ
@@ -3,20 +3,34 @@
 """
 
 import pytest
-from datetime import datetime
-from unittest.mock import patch, MagicMock
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
 import swisseph as swe
+from starlette.testclient import TestClient
 
 from services.ephem import (
+    get_planets,
+    get_aspects,
+    get_houses,
+    get_moon_phase,
+    get_full_chart,
+    _calculate_full_chart_sync,
+    _datetime_to_jd,
     _calculate_planet_position,
     _calculate_ascendant,
     _calculate_houses,
     _calculate_aspects,
     _calculate_moon_phase,
+    _calculate_planets_range_sync,
+    _get_illumination_percent,
     _get_cache_key,
     _is_cache_valid,
     _get_from_cache,
     _save_to_cache,
+    _workers_from_env,
+    CACHE_TTL_SECONDS,
+    RANGE_MAX_STEPS,
     HOUSE_SYSTEM_PLACIDUS,
     MAIN_PLANETS,
     EXTRA_POINTS
@@ -63,16 +77,22 @@ class TestEphemerisService:
     
     def test_get_cache_key(self):
         """Тест генерации ключа кеша"""
-        # Округляем время до часа
-        rounded_time = self.test_datetime.replace(minute=0, second=0, microsecond=0)
-        expected_key = f"{rounded_time.isoformat()}_{self.test_lat}_{self.test_lon}_False"
+        # Округляем время до часа: номер часа от начала эры
+        expected_hour = self.test_datetime.toordinal() * 24 + self.test_datetime.hour
+        expected_key = (expected_hour, None, self.test_lat, self.test_lon, False)
         
         key = _get_cache_key(self.test_datetime, self.test_lat, self.test_lon, False)
         assert key == expected_key
         
         # Тест с extra=True
         key_extra = _get_cache_key(self.test_datetime, self.test_lat, self.test_lon, True)
-        assert key_extra.endswith("_True")
+        assert key_extra[-1] is True
+        
+        # Соседние часы и одинаковое время в разных часовых поясах различаются
+        next_hour = self.test_datetime.replace(hour=13)
+        assert _get_cache_key(next_hour, self.test_lat, self.test_lon) != key
+        aware = self.test_datetime.replace(tzinfo=timezone(timedelta(hours=3)))
+        assert _get_cache_key(aware, self.test_lat, self.test_lon) != key
     
     def test_cache_operations(self):
         """Тест операций с кешем"""
@@ -92,13 +112,37 @@ class TestEphemerisService:
         # Проверяем валидность
         assert _is_cache_valid(cache_key) is True
     
+    def test_cache_expired_entry_evicted(self):
+        """Тест удаления устаревшей записи кеша"""
+        cache_key = "test_expired_key"
+        
+        with patch('services.ephem.time.monotonic', return_value=1000.0):
+            _save_to_cache(cache_key, {"test": "data"})
+        
+        with patch('services.ephem.time.monotonic', return_value=1000.0 + CACHE_TTL_SECONDS):
+            assert _get_from_cache(cache_key) is None
+            assert _is_cache_valid(cache_key) is False
+    
+    @patch('services.ephem.CACHE_MAX_SIZE', 2)
+    def test_cache_lru_eviction(self):
+        """Тест вытеснения давно использованных записей кеша"""
+        _save_to_cache("lru_a", {"key": "a"})
+        _save_to_cache("lru_b", {"key": "b"})
+        
+        # Обращение делает запись "a" недавно использованной
+        assert _get_from_cache("lru_a") == {"key": "a"}
+        
+        _save_to_cache("lru_c", {"key": "c"})
+        
+        assert _get_from_cache("lru_b") is None
+        assert _get_from_cache("lru_a") == {"key": "a"}
+        assert _get_from_cache("lru_c") == {"key": "c"}
+    
     @patch('services.ephem.swe.calc_ut')
     def test_calculate_planet_position_success(self, mock_calc_ut):
         """Тест успешного вычисления позиции планеты"""
-        # Мокаем результат Swiss Ephemeris
-        mock_result = MagicMock()
-        mock_result.__getitem__.side_effect = lambda x: MagicMock(__getitem__=lambda y: 45.0 if y == 0 else 2.5)
-        mock_calc_ut.return_value = [mock_result]
+        # Результат Swiss Ephemeris: ([долгота, широта, расстояние, скорости...], флаг)
+        mock_calc_ut.return_value = ([45.0, 0.0, 1.0, 2.5, 0.0, 0.0], 0)
         
         longitude, speed, retrograde = _calculate_planet_position(swe.SUN, self.test_jd)
         
@@ -113,9 +157,7 @@ class TestEphemerisService:
     def test_calculate_planet_position_retrograde(self, mock_calc_ut):
         """Тест вычисления ретроградной планеты"""
         # Мокаем результат с отрицательной скоростью (ретроградность)
-        mock_result = MagicMock()
-        mock_result.__getitem__.side_effect = lambda x: MagicMock(__getitem__=lambda y: 180.0 if y == 0 else -1.5)
-        mock_calc_ut.return_value = [mock_result]
+        mock_calc_ut.return_value = ([180.0, 0.0, 1.0, -1.5, 0.0, 0.0], 0)
         
         longitude, speed, retrograde = _calculate_planet_position(swe.MARS, self.test_jd)
         
@@ -204,6 +246,7 @@ class TestEphemerisService:
         assert houses == []
         assert house_system == "Placidus"
     
+    @patch('services.ephem._aspects_config', None)
     @patch('builtins.open')
     @patch('services.ephem.yaml.safe_load')
     def test_calculate_aspects_success(self, mock_yaml_load, mock_open):
@@ -233,29 +276,70 @@ class TestEphemerisService:
         sun_moon_aspects = [a for a in aspects if "Sun" in a["planets"] and "Moon" in a["planets"]]
         assert len(sun_moon_aspects) > 0
     
+    @patch('services.ephem._aspects_config', None)
     @patch('builtins.open')
     def test_calculate_aspects_file_error(self, mock_open):
         """Тест обработки ошибки файла конфигурации аспектов"""
         # Мокаем ошибку открытия файла
         mock_open.side_effect = Exception("File not found")
         
-        planets_data = {"Sun": {"longitude": 0.0}}
+        planets_data = {"Sun": {"longitude": 0.0}, "Moon": {"longitude": 180.0}}
         aspects = _calculate_aspects(planets_data)
         
         # Должны получить пустой список
         assert aspects == []
     
+    @patch('services.ephem._aspects_config', None)
+    @patch('builtins.open')
+    @patch('services.ephem.yaml.safe_load')
+    def test_calculate_aspects_config_loaded_once(self, mock_yaml_load, mock_open):
+        """Тест однократного чтения конфигурации аспектов"""
+        mock_yaml_load.return_value = {
+            "aspects": {"conjunction": {"angle": 0, "orb": 10, "name": "Соединение"}}
+        }
+        
+        planets_data = {"Sun": {"longitude": 10.0}, "Mars": {"longitude": 15.0}}
+        _calculate_aspects(planets_data)
+        aspects = _calculate_aspects(planets_data)
+        
+        assert mock_yaml_load.call_count == 1
+        assert aspects[0]["type"] == "conjunction"
+
+    @patch('services.ephem._aspects_config', None)
+    @patch('builtins.open')
+    @patch('services.ephem.yaml.safe_load')
+    def test_calculate_aspects_orb_boundary(self, mock_yaml_load, mock_open):
+        """Тест аспекта на границе орба (таблица кандидатов по градусам)"""
+        mock_yaml_load.return_value = {
+            "aspects": {
+                "trine": {"angle": 120, "orb": 10, "name": "Трин"},
+                "square": {"angle": 90, "orb": 10, "name": "Квадрат"}
+            }
+        }
+
+        planets_data = {
+            "Sun": {"longitude": 0.0},
+            "Moon": {"longitude": 110.0},
+            "Mars": {"longitude": 209.5}
+        }
+        aspects = _calculate_aspects(planets_data)
+
+        # Sun-Moon: 110° — ровно на границе орба трина и квадрата, из равных
+        # выбирается первый в конфигурации; Moon-Mars: 99.5° — квадрат;
+        # Sun-Mars: 150.5° — вне орбов
+        assert [(a["planets"], a["type"], a["orb"]) for a in aspects] == [
+            (["Sun", "Moon"], "trine", 10.0),
+            (["Moon", "Mars"], "square", 9.5)
+        ]
+
     @patch('services.ephem.swe.calc_ut')
     def test_calculate_moon_phase_success(self, mock_calc_ut):
         """Тест успешного вычисления фазы Луны"""
         # Мокаем результаты Swiss Ephemeris
-        mock_sun = MagicMock()
-        mock_sun.__getitem__.side_effect = lambda x: MagicMock(__getitem__=lambda y: 0.0 if y == 0 else 0)
+        sun_result = ([0.0, 0.0, 1.0, 0.0, 0.0, 0.0], 0)
+        moon_result = ([90.0, 0.0, 1.0, 0.0, 0.0, 0.0], 0)
         
-        mock_moon = MagicMock()
-        mock_moon.__getitem__.side_effect = lambda x: MagicMock(__getitem__=lambda y: 90.0 if y == 0 else 0)
-        
-        mock_calc_ut.side_effect = [mock_sun, mock_moon]
+        mock_calc_ut.side_effect = [sun_result, moon_result]
         
         moon_data = _calculate_moon_phase(self.test_jd)
         
@@ -300,5 +384,138 @@ class TestEphemerisService:
         # Разные флаги extra - разные ключи
         key4 = _get_cache_key(dt1, 55.0, 37.0, True)
         assert key1 != key4
+    
+    @patch('services.ephem._calculate_planets_sync')
+    def test_calculate_planets_range(self, mock_planets_sync):
+        """Тест расчёта планет для ряда моментов времени"""
+        mock_planets_sync.side_effect = lambda dt, lat, lon, extra: {"datetime": dt.isoformat()}
+        
+        results = _calculate_planets_range_sync(
+            self.test_datetime, self.test_datetime + timedelta(hours=3), timedelta(hours=1),
+            self.test_lat, self.test_lon
+        )
+        
+        # Конец интервала не включается
+        assert [r["datetime"] for r in results] == [
+            "2024-01-15T12:00:00", "2024-01-15T13:00:00", "2024-01-15T14:00:00"
+        ]
+    
+    def test_calculate_planets_range_invalid_step(self):
+        """Тест ошибки при неположительном шаге"""
+        with pytest.raises(ValueError):
+            _calculate_planets_range_sync(
+                self.test_datetime, self.test_datetime + timedelta(hours=3), timedelta(0),
+                self.test_lat, self.test_lon
+            )
+    
+    @patch('services.ephem._calculate_planets_sync')
+    def test_calculate_planets_range_max_steps(self, mock_planets_sync):
+        """Тест: ряд ровно из RANGE_MAX_STEPS моментов считается, на один больше — ошибка"""
+        mock_planets_sync.return_value = {}
+        step = timedelta(minutes=1)
+        
+        results = _calculate_planets_range_sync(
+            self.test_datetime, self.test_datetime + step * RANGE_MAX_STEPS, step,
+            self.test_lat, self.test_lon
+        )
+        assert len(results) == RANGE_MAX_STEPS
+        
+        mock_planets_sync.reset_mock()
+        with pytest.raises(ValueError):
+            _calculate_planets_range_sync(
+                self.test_datetime, self.test_datetime + step * RANGE_MAX_STEPS + timedelta(seconds=1), step,
+                self.test_lat, self.test_lon
+            )
+        mock_planets_sync.assert_not_called()
+    
+    @patch('services.ephem.swe.pheno_ut')
+    def test_illumination_error_not_cached(self, mock_pheno_ut):
+        """Тест: ошибка pheno_ut на одной дате не отключает освещённость тела на других"""
+        mock_pheno_ut.side_effect = [Exception("Test error"), ([0.0, 0.5, 0.0, 0.0, 0.0], 0)]
+        
+        assert _get_illumination_percent(swe.CERES, self.test_jd) is None
+        assert _get_illumination_percent(swe.CERES, self.test_jd + 1) == 50.0
+        assert mock_pheno_ut.call_count == 2
+    
+    @pytest.mark.parametrize("raw,expected", [("", 4), ("2", 2), ("0", 4), ("-1", 4), ("abc", 4)])
+    def test_workers_from_env(self, monkeypatch, raw, expected):
+        """Тест: некорректное EPHEMERIS_WORKERS заменяется значением по умолчанию"""
+        monkeypatch.setenv("EPHEMERIS_WORKERS", raw)
+        
+        assert _workers_from_env(4) == expected
 
 
+class TestFullChart:
+    """Тесты объединённого расчёта полной карты"""
+    
+    def setup_method(self):
+        """Настройка перед каждым тестом"""
+        self.test_datetime = datetime(2024, 3, 20, 9, 30, 0)
+        self.test_lat = 55.7558
+        self.test_lon = 37.6176
+    
+    def test_full_chart_matches_separate_calls(self):
+        """Тест: полная карта совпадает с ответами отдельных эндпоинтов"""
+        async def calculate():
+            dt, lat, lon = self.test_datetime, self.test_lat, self.test_lon
+            separate = (
+                await get_planets(dt, lat, lon, True),
+                await get_aspects(dt, lat, lon),
+                await get_houses(dt, lat, lon),
+                await get_moon_phase(dt),
+            )
+            return separate, await get_full_chart(dt, lat, lon)
+        
+        (planets, aspects, houses, moon_phase), chart = asyncio.run(calculate())
+        
+        assert chart["planets"] == planets["planets"]
+        assert chart["aspects"] == aspects["aspects"]
+        assert chart["houses"] == houses["houses"]
+        assert chart["house_system"] == houses["house_system"]
+        assert chart["moon_phase"] == moon_phase["moon_phase"]
+    
+    def test_full_chart_julian_date_computed_once(self):
+        """Тест: юлианская дата вычисляется один раз на всю карту"""
+        with patch('services.ephem._datetime_to_jd', wraps=_datetime_to_jd) as mock_to_jd:
+            chart = _calculate_full_chart_sync(self.test_datetime, self.test_lat, self.test_lon)
+        
+        assert "error" not in chart
+        mock_to_jd.assert_called_once_with(self.test_datetime)
+    
+    @pytest.mark.parametrize("failing_body", [swe.SUN, swe.MOON])
+    def test_full_chart_moon_phase_error(self, failing_body):
+        """Тест: без позиции Солнца или Луны фаза — та же ошибка, что у /moon_phase"""
+        calc_ut = swe.calc_ut
+        
+        def failing_calc_ut(jd, body, *args):
+            if body == failing_body:
+                raise Exception("Test error")
+            return calc_ut(jd, body, *args)
+        
+        with patch('services.ephem.swe.calc_ut', side_effect=failing_calc_ut):
+            chart = _calculate_full_chart_sync(self.test_datetime, self.test_lat, self.test_lon)
+            moon_phase = asyncio.run(get_moon_phase(self.test_datetime))
+        
+        assert chart["moon_phase"]["phase_name"] == "Ошибка"
+        assert chart["moon_phase"] == moon_phase["moon_phase"]
+    
+    def test_full_chart_endpoint(self):
+        """Тест эндпоинта /full_chart: ответ совпадает с get_full_chart"""
+        from app import app
+        from utils.auth import APIKey
+        
+        api_key = APIKey(key_id="test_key", name="Test Key", key_hash="test_hash", rate_limit=0)
+        with patch('utils.middleware.authenticate_api_key', return_value=api_key):
+            response = TestClient(app).get("/full_chart", params={
+                "datetime_str": self.test_datetime.isoformat(),
+                "lat": self.test_lat,
+                "lon": self.test_lon,
+            }, headers={"X-API-Key": "test"})
+        
+        assert response.status_code == 200
+        data = response.json()
+        expected = asyncio.run(get_full_chart(self.test_datetime, self.test_lat, self.test_lon))
+        assert data["planets"] == expected["planets"]
+        assert data["moon_phase"] == expected["moon_phase"]
+        assert data["house_system"] == expected["house_system"]
+        assert len(data["houses"]) == 12
@@ -0,0 +1,243 @@
+"""
+Тесты для middleware Ephemeris Decoder API
+"""
+
+import pytest
+import asyncio
+from unittest.mock import patch, MagicMock
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import utils.middleware
+from utils.auth import APIKey
+from utils.middleware import AuthenticationMiddleware, RateLimitMiddleware
+
+
+def _ok(request):
+    return PlainTextResponse("ok")
+
+
+def _make_client(**kwargs) -> TestClient:
+    """Приложение с одним маршрутом под RateLimitMiddleware"""
+    app = Starlette(routes=[Route("/", _ok)])
+    app.add_middleware(RateLimitMiddleware, **kwargs)
+    return TestClient(app)
+
+
+class TestRateLimitMiddleware:
+    """Тесты локального rate limiting со скользящим окном"""
+
+    def setup_method(self):
+        """Настройка перед каждым тестом"""
+        self.now = 1200.0  # начало минутного окна
+        self.time_patch = patch('utils.middleware.time.time', lambda: self.now)
+        self.time_patch.start()
+
+    def teardown_method(self):
+        """Очистка после каждого теста"""
+        self.time_patch.stop()
+
+    @pytest.fixture(autouse=True)
+    def _no_redis(self, monkeypatch):
+        monkeypatch.delenv("REDIS_URL", raising=False)
+
+    def test_limit_within_window(self):
+        """Тест: сверх лимита в одном окне запросы отклоняются с 429"""
+        client = _make_client(max_requests_per_minute=3)
+
+        statuses = [client.get("/").status_code for _ in range(5)]
+
+        assert statuses == [200, 200, 200, 429, 429]
+        response = client.get("/")
+        assert response.json()["error"] == "Too many requests"
+
+    def test_previous_window_weighted(self):
+        """Тест: запросы прошлого окна учитываются с весом оставшейся доли минуты"""
+        middleware = RateLimitMiddleware(None, max_requests_per_minute=4)
+        for _ in range(4):
+            assert middleware._is_rate_limited_local("1.1.1.1") is False
+
+        # Середина следующего окна: 4 * 0.5 = 2 запроса ещё учитываются
+        self.now = 1290.0
+        assert middleware._is_rate_limited_local("1.1.1.1") is False
+        assert middleware._is_rate_limited_local("1.1.1.1") is False
+        assert middleware._is_rate_limited_local("1.1.1.1") is True
+
+        # Через окно прошлые запросы уже не учитываются
+        self.now = 1440.0
+        assert middleware._is_rate_limited_local("1.1.1.1") is False
+
+    def test_separate_ips(self):
+        """Тест: лимит считается для каждого IP отдельно"""
+        middleware = RateLimitMiddleware(None, max_requests_per_minute=1)
+
+        assert middleware._is_rate_limited_local("1.1.1.1") is False
+        assert middleware._is_rate_limited_local("1.1.1.1") is True
+        assert middleware._is_rate_limited_local("2.2.2.2") is False
+
+    def test_stale_ips_pruned(self):
+        """Тест: IP без запросов два окна удаляются из счётчиков"""
+        middleware = RateLimitMiddleware(None, max_requests_per_minute=10)
+        middleware._is_rate_limited_local("1.1.1.1")
+
+        self.now = 1260.0
+        middleware._is_rate_limited_local("2.2.2.2")
+        assert "1.1.1.1" in middleware.requests
+
+        self.now = 1320.0
+        middleware._is_rate_limited_local("2.2.2.2")
+        assert "1.1.1.1" not in middleware.requests
+        assert "2.2.2.2" in middleware.requests
+
+
+class _FakeRedisScript:
+    """Замена зарегистрированного Lua-скрипта: считает запросы по ключу"""
+
+    def __init__(self):
+        self.counts = {}
+        self.calls = 0
+        self.error = None
+
+    async def __call__(self, keys, args):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        limit = args[2]
+        count = self.counts.get(keys[0], 0)
+        if count >= limit:
+            return count + 1
+        self.counts[keys[0]] = count + 1
+        return count + 1
+
+
+class TestRateLimitMiddlewareRedis:
+    """Тесты rate limiting через Redis (REDIS_URL)"""
+
+    def setup_method(self):
+        """Настройка перед каждым тестом: пакет redis заменяется заглушкой"""
+        self.script = _FakeRedisScript()
+        self.fake_redis = MagicMock()
+        self.fake_redis.from_url.return_value.register_script.return_value = self.script
+        self.redis_patch = patch.object(utils.middleware, "redis_asyncio", self.fake_redis)
+        self.redis_patch.start()
+
+    def teardown_method(self):
+        """Очистка после каждого теста"""
+        self.redis_patch.stop()
+
+    def test_redis_counts_requests(self):
+        """Тест: при REDIS_URL лимит считается скриптом Redis с короткими таймаутами"""
+        client = _make_client(max_requests_per_minute=2, redis_url="redis://localhost:6379/0")
+
+        statuses = [client.get("/").status_code for _ in range(3)]
+
+        assert statuses == [200, 200, 429]
+        assert self.script.calls == 3
+        _, kwargs = self.fake_redis.from_url.call_args
+        assert kwargs["socket_connect_timeout"] == RateLimitMiddleware.REDIS_TIMEOUT_SECONDS
+        assert kwargs["socket_timeout"] == RateLimitMiddleware.REDIS_TIMEOUT_SECONDS
+
+    def test_redis_failure_falls_back_with_backoff(self, capsys):
+        """Тест: при ошибке Redis — локальные счётчики, одно сообщение и пауза перед повтором"""
+        middleware = RateLimitMiddleware(None, max_requests_per_minute=2, redis_url="redis://localhost:6379/0")
+        self.script.error = ConnectionError("Connection refused")
+
+        async def run_requests(count):
+            return [await middleware._is_rate_limited("1.1.1.1") for _ in range(count)]
+
+        assert asyncio.run(run_requests(3)) == [False, False, True]
+        # Redis опрошен один раз, дальше до истечения паузы не трогается
+        assert self.script.calls == 1
+        assert capsys.readouterr().out.count("Ошибка Redis") == 1
+
+        # После паузы Redis снова используется
+        self.script.error = None
+        middleware._redis_retry_at = 0.0
+        assert asyncio.run(run_requests(1)) == [False]
+        assert self.script.calls == 2
+        assert "снова доступен" in capsys.readouterr().out
+
+
+def _make_request(headers=(), query_string: bytes = b"") -> Request:
+    """Запрос из сырого ASGI scope: заголовки — список пар байтовых строк"""
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/planets",
+        "headers": [(name.lower(), value) for name, value in headers],
+        "query_string": query_string,
+    })
+
+
+class TestAuthenticationMiddleware:
+    """Тесты извлечения API ключа и исключённых путей"""
+
+    def setup_method(self):
+        """Настройка перед каждым тестом"""
+        self.middleware = AuthenticationMiddleware(None)
+
+    def _extract(self, headers=(), query_string: bytes = b""):
+        """Ключ, который middleware извлечёт из запроса"""
+        return self.middleware._extract_api_key(_make_request(headers, query_string))
+
+    def test_header_wins_over_query_and_bearer(self):
+        """Тест: X-API-Key имеет приоритет над ?api_key= и Authorization"""
+        headers = [(b"authorization", b"Bearer bearer-key"), (b"x-api-key", b" header-key ")]
+
+        assert self._extract(headers, b"api_key=query-key") == "header-key"
+
+    def test_empty_header_falls_back(self):
+        """Тест: пустой X-API-Key — сначала ?api_key=, затем Authorization: Bearer"""
+        headers = [(b"x-api-key", b""), (b"authorization", b"Bearer bearer-key")]
+
+        assert self._extract(headers, b"api_key=query-key") == "query-key"
+        assert self._extract(headers) == "bearer-key"
+        assert self._extract([(b"x-api-key", b"")]) is None
+
+    def test_duplicate_headers_first_wins(self):
+        """Тест: из повторяющихся заголовков берётся первый, как у headers.get"""
+        assert self._extract([(b"x-api-key", b"first"), (b"x-api-key", b"second")]) == "first"
+        assert self._extract([(b"x-api-key", b""), (b"x-api-key", b"second")]) is None
+        assert self._extract([(b"authorization", b"Bearer first"),
+                              (b"authorization", b"Bearer second")]) == "first"
+
+    def test_non_bearer_authorization_ignored(self):
+        """Тест: Authorization не в формате Bearer не считается ключом"""
+        assert self._extract([(b"authorization", b"Basic dXNlcjpwYXNz")]) is None
+        assert self._extract([(b"authorization", b"bearer lowercase")]) is None
+
+    def test_excluded_paths(self):
+        """Тест: точные и префиксные (/static/*) исключения пропускаются без ключа"""
+        app = Starlette(routes=[
+            Route("/health", _ok),
+            Route("/static/{name}", _ok),
+            Route("/planets", _ok),
+        ])
+        app.add_middleware(AuthenticationMiddleware, excluded_paths=["/health", "/static/*"])
+        client = TestClient(app)
+
+        assert client.get("/health").status_code == 200
+        assert client.get("/static/app.js").status_code == 200
+        assert client.get("/static").status_code == 401
+        response = client.get("/planets")
+        assert response.status_code == 401
+        assert response.json()["error"] == "API key required"
+
+    def test_authenticated_request_headers(self):
+        """Тест: при валидном ключе ответ содержит сведения о ключе и времени обработки"""
+        app = Starlette(routes=[Route("/planets", _ok)])
+        app.add_middleware(AuthenticationMiddleware)
+        api_key = APIKey(key_id="test_key", name="Test Key", key_hash="test_hash", usage_count=5)
+
+        with patch('utils.middleware.authenticate_api_key', return_value=api_key) as mock_auth:
+            response = TestClient(app).get("/planets", headers={"X-API-Key": "secret"})
+
+        mock_auth.assert_called_once_with("secret")
+        assert response.status_code == 200
+        assert response.headers["X-API-Key-ID"] == "test_key"
+        assert response.headers["X-API-Key-Usage"] == "5"
+        seconds, milliseconds = response.headers["X-Process-Time"].split(".")
+        assert seconds.isdigit() and len(milliseconds) == 3
@@ -0,0 +1,160 @@
+"""
+Тесты для сервиса натальных карт
+"""
+
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
+import services.natal_chart as natal_chart
+from services.natal_chart import calculate_natal_chart, get_timezone_by_coordinates
+
+
+def _birth_params(day: int = 15) -> dict:
+    """Параметры рождения для calculate_natal_chart"""
+    return dict(year=1990, month=5, day=day, hour=12, minute=30, city="Moscow", nation="RU",
+                lat=55.7558, lon=37.6176, tz_str="Europe/Moscow")
+
+
+def _fake_chart(*args) -> dict:
+    """Результат _calculate_natal_chart_sync без kerykeion"""
+    return {
+        "subject_info": {"birth_date": f"{args[0]}-{args[1]:02d}-{args[2]:02d}"},
+        "planets": {"Sun": {"name": "Sun", "sign": "Taurus", "longitude": 54.5}},
+        "houses": [{"house": 1, "sign": "Virgo"}],
+        "aspects": [{"planet1": "Sun", "planet2": "Moon", "aspect": "Trine"}],
+        "statistics": {
+            "planets_count": 1,
+            "elements_distribution": {"Fire": 0, "Earth": 1, "Air": 0, "Water": 0},
+            "qualities_distribution": {"Cardinal": 0, "Fixed": 1, "Mutable": 0}
+        }
+    }
+
+
+class _FakePool:
+    """Пул, выполняющий задачи синхронно; broken=True имитирует упавший воркер"""
+
+    def __init__(self, broken: bool = False):
+        self.broken = broken
+        self.submitted = 0
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        future = Future()
+        if self.broken:
+            future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        else:
+            future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class TestCalculateNatalChart:
+    """Тесты пула процессов и кеша карт"""
+
+    def setup_method(self):
+        """Настройка перед каждым тестом: пул и расчёт заменяются заглушками"""
+        natal_chart._chart_cache.clear()
+        self.pool = _FakePool()
+        self.executor_patch = patch.object(natal_chart, "executor", self.pool)
+        self.sync_patch = patch.object(natal_chart, "_calculate_natal_chart_sync", side_effect=_fake_chart)
+        self.executor_patch.start()
+        self.mock_sync = self.sync_patch.start()
+
+    def teardown_method(self):
+        """Очистка после каждого теста"""
+        self.sync_patch.stop()
+        self.executor_patch.stop()
+        natal_chart._chart_cache.clear()
+
+    def test_broken_pool_restarted_and_retried_once(self, capsys):
+        """Тест: после BrokenProcessPool пул пересоздаётся один раз, расчёт повторяется один раз"""
+        broken = _FakePool(broken=True)
+        natal_chart.executor = broken
+
+        with patch.object(natal_chart, "_create_executor", return_value=self.pool) as mock_create:
+            result = asyncio.run(calculate_natal_chart(**_birth_params()))
+
+        assert result == _fake_chart(1990, 5, 15)
+        mock_create.assert_called_once_with()
+        assert broken.submitted == 1 and broken.shut_down
+        assert self.pool.submitted == 1
+        assert natal_chart.executor is self.pool
+        assert "пересоздаём" in capsys.readouterr().out
+
+    def test_stale_broken_pool_not_restarted_twice(self):
+        """Тест: ошибка от уже заменённого пула не пересоздаёт текущий"""
+        stale = _FakePool(broken=True)
+
+        with patch.object(natal_chart, "_create_executor") as mock_create:
+            natal_chart._restart_executor(stale)
+
+        mock_create.assert_not_called()
+        assert natal_chart.executor is self.pool
+
+    def test_cache_hit_returns_copy(self):
+        """Тест: изменение выданной карты не портит кеш"""
+        first = asyncio.run(calculate_natal_chart(**_birth_params()))
+        first["planets"]["Sun"]["sign"] = "Changed"
+        first["aspects"].clear()
+        first["statistics"]["elements_distribution"]["Fire"] = 99
+
+        second = asyncio.run(calculate_natal_chart(**_birth_params()))
+        second["houses"][0]["sign"] = "Changed"
+        third = asyncio.run(calculate_natal_chart(**_birth_params()))
+
+        assert third == _fake_chart(1990, 5, 15)
+        assert self.pool.submitted == 1
+
+    def test_errors_not_cached(self):
+        """Тест: карта с ошибкой не кешируется"""
+        self.mock_sync.side_effect = lambda *args: {"error": "Test error"}
+
+        asyncio.run(calculate_natal_chart(**_birth_params()))
+        asyncio.run(calculate_natal_chart(**_birth_params()))
+
+        assert self.pool.submitted == 2
+        assert len(natal_chart._chart_cache) == 0
+
+    def test_cache_eviction_at_max_size(self):
+        """Тест: при переполнении вытесняется давно не запрошенная карта"""
+        with patch.object(natal_chart, "CHART_CACHE_MAX_SIZE", 2):
+            asyncio.run(calculate_natal_chart(**_birth_params(day=1)))
+            asyncio.run(calculate_natal_chart(**_birth_params(day=2)))
+            # Повторный запрос делает первую карту самой свежей
+            asyncio.run(calculate_natal_chart(**_birth_params(day=1)))
+            asyncio.run(calculate_natal_chart(**_birth_params(day=3)))
+
+            assert len(natal_chart._chart_cache) == 2
+            assert self.pool.submitted == 3
+
+            asyncio.run(calculate_natal_chart(**_birth_params(day=1)))
+            assert self.pool.submitted == 3
+            asyncio.run(calculate_natal_chart(**_birth_params(day=2)))
+            assert self.pool.submitted == 4
+
+
+class TestTimezoneByCoordinates:
+    """Тесты определения часового пояса"""
+
+    def test_fallback_without_timezonefinder(self):
+        """Тест: без timezonefinder используется приближение по координатам"""
+        with patch.object(natal_chart, "TimezoneFinder", None):
+            assert get_timezone_by_coordinates(55.7558, 37.6176) == "Europe/Moscow"
+            assert get_timezone_by_coordinates(40.7128, -74.0060) == "UTC"
+
+    def test_timezonefinder_used_when_available(self):
+        """Тест: при наличии timezonefinder используется его ответ"""
+        natal_chart._get_timezone_finder.cache_clear()
+        try:
+            with patch.object(natal_chart, "TimezoneFinder") as mock_finder:
+                mock_finder.return_value.timezone_at.return_value = "America/New_York"
+
+                assert get_timezone_by_coordinates(40.7128, -74.0060) == "America/New_York"
+                mock_finder.return_value.timezone_at.assert_called_once_with(lng=-74.0060, lat=40.7128)
+        finally:
+            natal_chart._get_timezone_finder.cache_clear()
@@ -5,8 +5,12 @@
 import pytest
 from utils.zodiac import (
     degrees_to_sign_and_degrees,
+    degrees_to_sign_and_degrees_batch,
+    degrees_to_sign_index_batch,
     normalize_angle,
     calculate_orb,
+    moon_phase_name,
+    MOON_PHASE_NAMES,
     ZODIAC_SIGNS,
     ZODIAC_DEGREES
 )
@@ -46,6 +50,23 @@ class TestZodiacUtils:
         assert sign == "Телец"
         assert degrees == 15.0
     
+    def test_degrees_to_sign_and_degrees_batch(self):
+        """Тест пакетного преобразования совпадает с поштучным"""
+        longitudes = [0, 29.99, 30, 185.5, 359.99, 360, -15, 725]
+        
+        assert degrees_to_sign_and_degrees_batch(longitudes) == [
+            degrees_to_sign_and_degrees(longitude) for longitude in longitudes
+        ]
+        assert degrees_to_sign_and_degrees_batch([]) == []
+    
+    def test_degrees_to_sign_index_batch(self):
+        """Тест пакетного получения номеров знаков"""
+        indices, remainders = degrees_to_sign_index_batch([0, 45, 359.5, -15, 725])
+        
+        assert indices == [0, 1, 11, 11, 0]
+        assert remainders == [0.0, 15.0, 29.5, 15.0, 5.0]
+        assert degrees_to_sign_index_batch([]) == ([], [])
+    
     def test_degrees_to_sign_and_degrees_boundaries(self):
         """Тест граничных значений знаков"""
         # Граница между Овном и Тельцом
@@ -73,6 +94,12 @@ class TestZodiacUtils:
         sign, degrees = degrees_to_sign_and_degrees(-90)
         assert sign == "Козерог"
         assert degrees == 0.0
+        
+        # -1e-18 % 360 округляется до 360.0 — это начало Овна, а не 13-й знак
+        sign, degrees = degrees_to_sign_and_degrees(-1e-18)
+        assert sign == "Овен"
+        assert degrees == 0.0
+        assert degrees_to_sign_index_batch([-1e-18]) == ([0], [0.0])
     
     def test_degrees_to_sign_and_degrees_large_values(self):
         """Тест больших значений градусов"""
@@ -133,5 +160,21 @@ class TestZodiacUtils:
             sign, degrees = degrees_to_sign_and_degrees(mid_degree)
             assert sign == expected_sign
             assert degrees == 15.0
-
-
+    
+    def test_moon_phase_name(self):
+        """Тест определения фазы Луны по углу"""
+        assert moon_phase_name(0) == "Новолуние"
+        assert moon_phase_name(44.99) == "Новолуние"
+        assert moon_phase_name(45) == "Растущий серп"
+        assert moon_phase_name(90) == "Первая четверть"
+        assert moon_phase_name(180) == "Полнолуние"
+        assert moon_phase_name(314.99) == "Последняя четверть"
+        assert moon_phase_name(315) == "Убывающий серп"
+        assert moon_phase_name(360) == "Новолуние"
+    
+    def test_moon_phase_name_sector_table(self):
+        """Тест: каждый 45-градусный сектор соответствует своей фазе по порядку"""
+        for sector, name in enumerate(MOON_PHASE_NAMES):
+            start = sector * 45
+            assert moon_phase_name(start) == name
+            assert moon_phase_name(start + 44.999) == name
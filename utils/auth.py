@@ -2,15 +2,24 @@
 Модуль аутентификации для Ephemeris Decoder API
 """
 
+import asyncio
+import atexit
 import hashlib
 import os
 import secrets
+import sys
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Dict, Optional, List
 import yaml
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 from enum import Enum
 
+# Загрузчик и дампер YAML на libyaml (C), если PyYAML собран с ней
+_YAMLLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_YAMLDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
 
 class APIKeyPermission(Enum):
     """Разрешения для API ключей"""
@@ -19,6 +28,15 @@ class APIKeyPermission(Enum):
     ADMIN = "admin"         # Полный доступ + управление ключами
 
 
+# Битовые маски разрешений; ADMIN включает все остальные разрешения
+_PERMISSION_BITS = {
+    APIKeyPermission.READ: 1,
+    APIKeyPermission.WRITE: 2,
+    APIKeyPermission.ADMIN: 4,
+}
+_ALL_PERMISSIONS_MASK = 7
+
+
 class APIKey(BaseModel):
     """Модель API ключа"""
     key_id: str = Field(..., description="Уникальный идентификатор ключа")
@@ -32,15 +50,42 @@ class APIKey(BaseModel):
     rate_limit: int = Field(100, description="Максимальное количество запросов в час (0 = без лимита)")
     usage_count: int = Field(0, description="Количество использований")
 
-    def is_expired(self) -> bool:
-        """Проверяет, истек ли срок действия ключа"""
+    @field_validator("key_id", "key_hash")
+    @classmethod
+    def _intern_identifier(cls, value: str) -> str:
+        """Интернирует идентификаторы: поиск в индексах по хешу и ID сравнивает их по ссылке"""
+        return sys.intern(value)
+
+    # Маска разрешений, вычисляется один раз из списка permissions
+    _permission_mask: int = PrivateAttr(0)
+
+    def model_post_init(self, __context) -> None:
+        """Вычисляет маску разрешений после валидации полей"""
+        mask = 0
+        for permission in self.permissions:
+            mask |= _PERMISSION_BITS[permission]
+        if mask & _PERMISSION_BITS[APIKeyPermission.ADMIN]:
+            mask = _ALL_PERMISSIONS_MASK
+        self._permission_mask = mask
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        """
+        Проверяет, истек ли срок действия ключа
+
+        Args:
+            now: Текущее время; передаётся при проверке нескольких ключей подряд,
+                чтобы не запрашивать часы на каждый ключ
+        """
         if self.expires_at is None:
             return False
-        return datetime.now() > self.expires_at
+        if now is None:
+            now = datetime.now()
+        return now > self.expires_at
 
     def has_permission(self, permission: APIKeyPermission) -> bool:
         """Проверяет, имеет ли ключ указанное разрешение"""
-        return permission in self.permissions or APIKeyPermission.ADMIN in self.permissions
+        bit = _PERMISSION_BITS[permission]
+        return self._permission_mask & bit == bit
 
     def can_make_request(self) -> bool:
         """Проверяет, может ли ключ сделать запрос (активен, не истек, в пределах лимита)"""
@@ -56,6 +101,31 @@ class APIKey(BaseModel):
         self.usage_count += 1
 
 
+# hashlib берёт SHA-256 из OpenSSL (с аппаратным ускорением SHA-NI/ARMv8, где оно
+# есть); без _hashlib используется заметно более медленная встроенная реализация
+if getattr(hashlib.sha256, "__module__", None) != "_hashlib":
+    print("Предупреждение: hashlib.sha256 работает без OpenSSL, хеширование API ключей будет медленнее")
+
+
+def _sha256_hex(raw_key: str) -> str:
+    """
+    SHA-256 ключа в hex. Дайджест не кешируется: кеш держал бы в памяти
+    сырые ключи, а запросы с произвольными ключами вытесняли бы из него
+    настоящие. Дайджест интернирован, как и APIKey.key_hash, поэтому поиск
+    в индексе по хешу совпадает по ссылке без посимвольного сравнения
+    """
+    return sys.intern(hashlib.sha256(raw_key.encode()).hexdigest())
+
+
+# Счётчики использования пишутся в файл фоновой задачей раз в USAGE_FLUSH_INTERVAL
+# секунд: проверка ключа обновляет их в памяти и лишь помечает как изменённые
+USAGE_FLUSH_INTERVAL = 5.0
+
+# Проверка изменений файла ключей перед запросами выполняется не чаще
+# раза в CONFIG_RELOAD_INTERVAL секунд
+CONFIG_RELOAD_INTERVAL = 0.5
+
+
 def _default_config_path() -> str:
     """Путь к config/api_keys.yaml относительно корня проекта (не зависит от CWD)."""
     env_path = os.getenv("API_KEYS_CONFIG")
@@ -71,14 +141,76 @@ class APIKeyManager:
     def __init__(self, config_path: Optional[str] = None):
         self.config_path = config_path or _default_config_path()
         self.keys: Dict[str, APIKey] = {}
+        # Индекс key_hash -> APIKey для проверки ключа одним обращением к словарю
+        self._by_hash: Dict[str, APIKey] = {}
+        # Несохранённые изменения счётчиков использования: номер последнего
+        # использования и номер, на котором файл был успешно записан
+        self._usage_version = 0
+        self._saved_usage_version = 0
+        # Запись файла идёт и из фонового потока (run_usage_flush_loop), поэтому
+        # запись и перечитывание файла выполняются под одной блокировкой
+        self._io_lock = threading.RLock()
+        # key_id -> usage_count в файле на момент последнего чтения или записи;
+        # разница со счётчиком в памяти — ещё не сохранённые использования
+        self._saved_usage: Dict[str, int] = {}
+        # (st_ino, st_mtime_ns, st_size) файла конфигурации на момент последнего
+        # чтения или записи: пока они не меняются, повторный разбор YAML не нужен
+        self._config_signature: Optional[tuple] = None
         self._load_keys()
+        self._last_reload_check = time.monotonic()
+
+    def reload_if_changed(self):
+        """Перечитывает ключи, если файл изменился; проверка не чаще CONFIG_RELOAD_INTERVAL"""
+        now = time.monotonic()
+        if now - self._last_reload_check < CONFIG_RELOAD_INTERVAL:
+            return
+        # Пока фоновый поток пишет файл, проверку пропускаем, не блокируя цикл событий
+        if not self._io_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_reload_check = now
+            self._load_keys()
+        finally:
+            self._io_lock.release()
+
+    def _stat_config(self) -> Optional[tuple]:
+        """Возвращает (st_ino, st_mtime_ns, st_size) файла конфигурации или None, если его нет"""
+        try:
+            st = os.stat(self.config_path)
+        except OSError:
+            return None
+        # Каждая запись заменяет файл через os.replace и меняет st_ino, поэтому
+        # две записи одного размера в пределах разрешения mtime тоже различимы
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _register_key(self, key: APIKey):
+        """Добавляет ключ в хранилище и в индекс по хешу"""
+        previous = self.keys.get(key.key_id)
+        if previous is not None and self._by_hash.get(previous.key_hash) is previous:
+            del self._by_hash[previous.key_hash]
+        self.keys[key.key_id] = key
+        self._by_hash[key.key_hash] = key
+
+    def _carry_unsaved_usage(self, key: APIKey, saved_count: int):
+        """
+        Переносит несохранённые использования уже загруженного ключа в его
+        новую копию из файла. Файл меняют другие воркеры и админ-операции,
+        и без этого перечитывание сбрасывало бы счётчик (и rate limit) к
+        значению из файла до очередного сохранения
+        """
+        previous = self.keys.get(key.key_id)
+        if previous is not None:
+            unsaved = previous.usage_count - self._saved_usage.get(key.key_id, 0)
+            if unsaved > 0:
+                key.usage_count += unsaved
+        self._saved_usage[key.key_id] = saved_count
 
     def _add_env_key_if_set(self):
         """Добавляет ключ из EPHEMERIS_API_KEY (для деплоя без файла конфига)."""
         raw = os.getenv("EPHEMERIS_API_KEY", "").strip()
         if not raw:
             return
-        key_hash = hashlib.sha256(raw.encode()).hexdigest()
+        key_hash = _sha256_hex(raw)
         env_key = APIKey(
             key_id="env_production",
             name="Production (env)",
@@ -87,13 +219,24 @@ class APIKeyManager:
             expires_at=None,
             rate_limit=0,
         )
-        self.keys[env_key.key_id] = env_key
+        # Ключ из env в файл не пишется, поэтому весь его счётчик — несохранённый
+        self._carry_unsaved_usage(env_key, 0)
+        self._register_key(env_key)
 
     def _load_keys(self):
-        """Загружает ключи из конфигурационного файла"""
+        """Загружает ключи из конфигурационного файла (пропускается, если файл не изменился)"""
+        with self._io_lock:
+            self._load_keys_locked()
+
+    def _load_keys_locked(self):
+        """Загрузка ключей; вызывается под self._io_lock"""
+        signature = self._stat_config()
+        if signature is not None and signature == self._config_signature:
+            return
+
         try:
             with open(self.config_path, "r", encoding="utf-8") as f:
-                config = yaml.safe_load(f) or {}
+                config = yaml.load(f, Loader=_YAMLLoader) or {}
 
             for key_data in config.get("api_keys", []):
                 # Конвертируем строковые разрешения обратно в enum
@@ -109,10 +252,15 @@ class APIKeyManager:
                     key_data['permissions'] = permissions
 
                 key = APIKey(**key_data)
-                self.keys[key.key_id] = key
+                self._carry_unsaved_usage(key, key.usage_count)
+                self._register_key(key)
 
+            self._config_signature = signature
             self._add_env_key_if_set()
         except FileNotFoundError:
+            # Подпись запоминается до создания конфигурации по умолчанию:
+            # _save_keys сверяет её с файлом и иначе снова вызвал бы загрузку
+            self._config_signature = None
             if os.getenv("EPHEMERIS_API_KEY", "").strip():
                 self._add_env_key_if_set()
                 return
@@ -120,17 +268,22 @@ class APIKeyManager:
             self._add_env_key_if_set()
         except Exception as e:
             print(f"Ошибка загрузки API ключей: {e}")
+            self._config_signature = signature
             self._create_default_config()
             self._add_env_key_if_set()
 
+    def _reload_if_stale_locked(self):
+        """Перечитывает ключи, если файл изменился после нашего последнего чтения или записи"""
+        if self._stat_config() != self._config_signature:
+            self._load_keys_locked()
+
     def _create_default_config(self):
         """Создает конфигурацию по умолчанию с демо-ключом"""
         # Создаем демо-ключ
         raw_key, demo_key = self.generate_key("demo_key", [APIKeyPermission.READ])
 
         # Конвертируем ключ для сериализации
-        key_dict = demo_key.model_dump()
-        key_dict['permissions'] = [p.value for p in demo_key.permissions]
+        key_dict = self._key_to_config(demo_key)
 
         config = {
             "api_keys": [key_dict],
@@ -143,25 +296,42 @@ class APIKeyManager:
 
         # Сохраняем конфигурацию
         with open(self.config_path, "w", encoding="utf-8") as f:
-            yaml.dump(config, f, allow_unicode=True, default_flow_style=False)
+            yaml.dump(config, f, Dumper=_YAMLDumper, allow_unicode=True, default_flow_style=False)
 
         print(f"Создан конфигурационный файл: {self.config_path}")
         print(f"Демо-ключ: {demo_key.key_id}")
         print(f"Raw key: {raw_key}")
 
+    @staticmethod
+    def _key_to_config(key: APIKey) -> Dict:
+        """Сериализует ключ для YAML: разрешения — строками, остальные поля как есть"""
+        # permissions исключаются из дампа, чтобы не копировать список enum,
+        # который всё равно заменяется строковыми значениями
+        key_dict = key.model_dump(exclude={"permissions"})
+        key_dict['permissions'] = [p.value for p in key.permissions]
+        return key_dict
+
     def _save_keys(self):
         """Сохраняет ключи в конфигурационный файл (ключи из env не сохраняются)."""
-        serializable_keys = []
-        for key in self.keys.values():
-            if key.key_id.startswith("env_"):
-                continue
-            key_dict = key.model_dump()
-            key_dict['permissions'] = [p.value for p in key.permissions]
-            serializable_keys.append(key_dict)
-        if not serializable_keys:
-            return
+        with self._io_lock:
+            # Файл мог изменить другой процесс (отозвать ключ, добавить новый).
+            # Запись устаревшего снимка отменила бы эти изменения, поэтому файл
+            # сначала перечитывается; несохранённые счётчики при этом переносятся
+            self._reload_if_stale_locked()
+
+            # Файл пишется целиком, поэтому отложенные счётчики тоже сохраняются.
+            # Номер использования берётся до снимка: использования, пришедшие
+            # во время записи, останутся несохранёнными
+            usage_version = self._usage_version
+            serializable_keys = []
+            for key in list(self.keys.values()):
+                if key.key_id.startswith("env_"):
+                    continue
+                serializable_keys.append(self._key_to_config(key))
+            if not serializable_keys:
+                self._saved_usage_version = usage_version
+                return
 
-        try:
             config = {
                 "api_keys": serializable_keys,
                 "notes": [
@@ -169,18 +339,39 @@ class APIKeyManager:
                     "Обновлено: " + datetime.now().isoformat()
                 ]
             }
-            with open(self.config_path, "w", encoding="utf-8") as f:
-                yaml.dump(config, f, allow_unicode=True, default_flow_style=False)
-        except OSError:
-            pass
+            # Запись во временный файл и атомарная замена: читатели не увидят
+            # наполовину записанный YAML
+            tmp_path = self.config_path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    yaml.dump(config, f, Dumper=_YAMLDumper, allow_unicode=True, default_flow_style=False)
+                os.replace(tmp_path, self.config_path)
+            except OSError as e:
+                # Счётчики остаются несохранёнными и будут записаны при следующей попытке
+                print(f"Ошибка сохранения API ключей: {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+
+            self._saved_usage_version = usage_version
+            # Файл совпадает с памятью — перечитывать собственную запись незачем
+            self._config_signature = self._stat_config()
+            for key_dict in serializable_keys:
+                self._saved_usage[key_dict["key_id"]] = key_dict["usage_count"]
 
     def update_key_rate_limit(self, key_id: str, new_rate_limit: int) -> bool:
         """Обновляет лимит запросов для ключа"""
-        if key_id in self.keys:
-            self.keys[key_id].rate_limit = new_rate_limit
-            self._save_keys()
-            return True
-        return False
+        with self._io_lock:
+            # Ключ меняется в уже перечитанной копии: перечитывание перед
+            # записью в _save_keys заменило бы изменённый объект версией из файла
+            self._reload_if_stale_locked()
+            if key_id in self.keys:
+                self.keys[key_id].rate_limit = new_rate_limit
+                self._save_keys()
+                return True
+            return False
 
     def generate_key(self, name: str, permissions: List[APIKeyPermission] = None,
                     expires_days: int = None, rate_limit: int = 100) -> tuple[str, APIKey]:
@@ -222,14 +413,14 @@ class APIKeyManager:
         )
 
         # Сохраняем ключ
-        self.keys[key_id] = api_key
+        self._register_key(api_key)
         self._save_keys()
 
         return raw_key, api_key
 
     def _hash_key(self, raw_key: str) -> str:
         """Создает хеш ключа для безопасного хранения"""
-        return hashlib.sha256(raw_key.encode()).hexdigest()
+        return _sha256_hex(raw_key)
 
     def verify_key(self, raw_key: str) -> Optional[APIKey]:
         """
@@ -241,30 +432,47 @@ class APIKeyManager:
         Returns:
             APIKey или None если ключ недействителен
         """
-        key_hash = self._hash_key(raw_key)
-
         # Ищем ключ по хешу
-        for key in self.keys.values():
-            if key.key_hash == key_hash:
-                if key.can_make_request():
-                    key.increment_usage()
-                    self._save_keys()  # Сохраняем обновленную статистику
-                    return key
-                break
+        key = self._by_hash.get(self._hash_key(raw_key))
+        if key is not None and key.can_make_request():
+            key.increment_usage()
+            # Статистика сохраняется фоновой задачей, не в обработке запроса
+            self._usage_version += 1
+            return key
 
         return None
 
+    def flush_usage(self):
+        """Сохраняет отложенные счётчики использования, если они изменились"""
+        if self._usage_version != self._saved_usage_version:
+            self._save_keys()
+
+    async def run_usage_flush_loop(self, interval: float = USAGE_FLUSH_INTERVAL):
+        """
+        Фоновая задача: периодически сохраняет отложенные счётчики использования
+
+        Args:
+            interval: Период сохранения в секундах
+        """
+        while True:
+            await asyncio.sleep(interval)
+            # Дамп YAML и запись файла — в потоке, чтобы не блокировать цикл событий
+            await asyncio.to_thread(self.flush_usage)
+
     def get_key_by_id(self, key_id: str) -> Optional[APIKey]:
         """Получает ключ по ID"""
         return self.keys.get(key_id)
 
     def revoke_key(self, key_id: str) -> bool:
         """Отзывает API ключ"""
-        if key_id in self.keys:
-            self.keys[key_id].is_active = False
-            self._save_keys()
-            return True
-        return False
+        with self._io_lock:
+            # См. update_key_rate_limit: сначала перечитываем файл, потом меняем ключ
+            self._reload_if_stale_locked()
+            if key_id in self.keys:
+                self.keys[key_id].is_active = False
+                self._save_keys()
+                return True
+            return False
 
     def list_keys(self) -> List[APIKey]:
         """Возвращает список всех ключей"""
@@ -272,33 +480,42 @@ class APIKeyManager:
 
     def get_stats(self) -> Dict:
         """Возвращает статистику использования ключей"""
-        total_keys = len(self.keys)
-        active_keys = len([k for k in self.keys.values() if k.is_active])
-        expired_keys = len([k for k in self.keys.values() if k.is_expired()])
-        total_usage = sum(k.usage_count for k in self.keys.values())
+        now = datetime.now()
+        active_keys = 0
+        expired_keys = 0
+        total_usage = 0
+        keys_summary = []
+
+        # Все агрегаты и сводка по ключам собираются за один проход
+        for k in self.keys.values():
+            if k.is_active:
+                active_keys += 1
+            if k.is_expired(now):
+                expired_keys += 1
+            total_usage += k.usage_count
+            keys_summary.append({
+                "key_id": k.key_id,
+                "name": k.name,
+                "permissions": [p.value for p in k.permissions],
+                "is_active": k.is_active,
+                "usage_count": k.usage_count,
+                "rate_limit": k.rate_limit,
+                "expires_at": k.expires_at.isoformat() if k.expires_at else None
+            })
 
         return {
-            "total_keys": total_keys,
+            "total_keys": len(self.keys),
             "active_keys": active_keys,
             "expired_keys": expired_keys,
             "total_usage": total_usage,
-            "keys": [
-                {
-                    "key_id": k.key_id,
-                    "name": k.name,
-                    "permissions": [p.value for p in k.permissions],
-                    "is_active": k.is_active,
-                    "usage_count": k.usage_count,
-                    "rate_limit": k.rate_limit,
-                    "expires_at": k.expires_at.isoformat() if k.expires_at else None
-                }
-                for k in self.keys.values()
-            ]
+            "keys": keys_summary
         }
 
 
 # Глобальный менеджер ключей
 key_manager = APIKeyManager()
+# Отложенные счётчики использования сохраняются при завершении процесса
+atexit.register(key_manager.flush_usage)
 
 
 def authenticate_api_key(raw_key: str) -> Optional[APIKey]:
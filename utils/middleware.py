@@ -5,8 +5,15 @@ Middleware для аутентификации Ephemeris Decoder API
 from fastapi import Request, HTTPException, Depends
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
+import os
 import time
+import uuid
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
 
 from utils.auth import authenticate_api_key, APIKey, APIKeyPermission, require_permission, key_manager
 
@@ -17,13 +24,17 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
     def __init__(self, app, excluded_paths: List[str] = None):
         super().__init__(app)
         self.excluded_paths = excluded_paths or ["/docs", "/redoc", "/openapi.json", "/health"]
+        # Точные пути проверяются по множеству, пути вида "/static/*" — по префиксу
+        self._excluded_exact = frozenset(p for p in self.excluded_paths if not p.endswith("/*"))
+        self._excluded_prefixes = tuple(p[:-1] for p in self.excluded_paths if p.endswith("/*"))
 
     async def dispatch(self, request: Request, call_next):
         """Обрабатывает входящий запрос"""
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
 
         # Пропускаем исключенные пути
-        if request.url.path in self.excluded_paths:
+        path = request.url.path
+        if path in self._excluded_exact or path.startswith(self._excluded_prefixes):
             response = await call_next(request)
             return response
 
@@ -40,8 +51,8 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
                 }
             )
 
-        # Перезагружаем конфигурацию ключей перед аутентификацией
-        key_manager._load_keys()
+        # Подхватываем изменения конфигурации ключей (разбор YAML только если файл изменился)
+        key_manager.reload_if_changed()
         
         # Аутентифицируем ключ
         authenticated_key = authenticate_api_key(api_key)
@@ -88,17 +99,33 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
         response.headers["X-API-Key-Limit"] = str(authenticated_key.rate_limit)
 
         # Логируем время выполнения
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = f"{process_time:.3f}"
+        # Монотонные часы не зависят от коррекции системного времени; секунды
+        # с тремя знаками (формат "0.123") собираются из целых миллисекунд
+        elapsed_ms = (time.perf_counter_ns() - start_ns + 500_000) // 1_000_000
+        seconds, milliseconds = divmod(elapsed_ms, 1000)
+        response.headers["X-Process-Time"] = f"{seconds}.{milliseconds:03d}"
 
         return response
 
     def _extract_api_key(self, request: Request) -> Optional[str]:
         """Извлекает API ключ из запроса"""
+        # Один проход по сырым заголовкам ASGI (имена уже в нижнем регистре)
+        # вместо построения Headers; берётся первое вхождение, как у headers.get
+        api_key_header = None
+        auth_header = None
+        for name, value in request.scope["headers"]:
+            if name == b"x-api-key":
+                if api_key_header is None:
+                    api_key_header = value
+                    if value:
+                        # Непустой X-API-Key имеет приоритет — остальное не нужно
+                        break
+            elif name == b"authorization" and auth_header is None:
+                auth_header = value
+
         # Проверяем заголовок X-API-Key
-        api_key = request.headers.get("X-API-Key")
-        if api_key:
-            return api_key.strip()
+        if api_key_header:
+            return api_key_header.decode("latin-1").strip()
 
         # Проверяем параметр запроса api_key
         api_key = request.query_params.get("api_key")
@@ -106,21 +133,21 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
             return api_key.strip()
 
         # Проверяем Authorization header (Bearer token format)
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            return auth_header[7:].strip()
+        if auth_header and auth_header.startswith(b"Bearer "):
+            return auth_header[7:].decode("latin-1").strip()
 
         return None
 
 
 def get_current_api_key(request: Request) -> APIKey:
     """Dependency для получения текущего API ключа"""
-    if not hasattr(request.state, 'api_key'):
+    api_key = getattr(request.state, 'api_key', None)
+    if api_key is None:
         raise HTTPException(
             status_code=401,
             detail="API key not found in request"
         )
-    return request.state.api_key
+    return api_key
 
 
 def require_read_permission(api_key: APIKey = Depends(get_current_api_key)) -> APIKey:
@@ -156,29 +183,63 @@ def require_admin_permission(api_key: APIKey = Depends(get_current_api_key)) ->
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """Middleware для дополнительного контроля rate limiting"""
 
-    def __init__(self, app, max_requests_per_minute: int = 60):
+    # Длина окна rate limiting в секундах
+    WINDOW_SECONDS = 60
+
+    # Таймауты подключения и ответа Redis: при недоступном Redis запрос
+    # не должен ждать TCP-таймаут ОС перед переходом на локальные счётчики
+    REDIS_TIMEOUT_SECONDS = 0.2
+    # После ошибки Redis не опрашивается столько секунд
+    REDIS_RETRY_SECONDS = 30.0
+
+    # Скользящее окно в sorted set Redis: удаление старых отметок, подсчёт и
+    # добавление нового запроса выполняются атомарно за одно обращение
+    REDIS_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+if count >= limit then
+    return count + 1
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('PEXPIRE', key, window)
+return count + 1
+"""
+
+    def __init__(self, app, max_requests_per_minute: int = 60, redis_url: Optional[str] = None):
         super().__init__(app)
         self.max_requests_per_minute = max_requests_per_minute
-        self.requests = {}
+        # IP -> (номер окна, запросов в текущем окне, запросов в предыдущем окне)
+        self.requests: Dict[str, Tuple[int, int, int]] = {}
+        self._last_prune_window = 0
+
+        # При заданном REDIS_URL счётчики общие для всех воркеров и инстансов
+        self._redis_script = None
+        # Момент (time.monotonic), до которого Redis не используется после ошибки
+        self._redis_retry_at = 0.0
+        self._redis_failing = False
+        redis_url = redis_url or os.getenv("REDIS_URL")
+        if redis_url:
+            if redis_asyncio is None:
+                print("Предупреждение: REDIS_URL задан, но пакет redis не установлен; rate limiting локальный")
+            else:
+                client = redis_asyncio.from_url(
+                    redis_url,
+                    socket_connect_timeout=self.REDIS_TIMEOUT_SECONDS,
+                    socket_timeout=self.REDIS_TIMEOUT_SECONDS
+                )
+                self._redis_script = client.register_script(self.REDIS_SCRIPT)
 
     async def dispatch(self, request: Request, call_next):
         """Обрабатывает запрос с дополнительным rate limiting"""
         # Получаем IP адрес клиента
         client_ip = self._get_client_ip(request)
 
-        # Проверяем rate limit
-        current_time = time.time()
-        if client_ip not in self.requests:
-            self.requests[client_ip] = []
-
-        # Очищаем старые запросы (старше 1 минуты)
-        self.requests[client_ip] = [
-            req_time for req_time in self.requests[client_ip]
-            if current_time - req_time < 60
-        ]
-
         # Проверяем лимит
-        if len(self.requests[client_ip]) >= self.max_requests_per_minute:
+        if await self._is_rate_limited(client_ip):
             return JSONResponse(
                 status_code=429,
                 content={
@@ -188,44 +249,104 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                 }
             )
 
-        # Добавляем текущий запрос
-        self.requests[client_ip].append(current_time)
-
         # Выполняем запрос
         response = await call_next(request)
         return response
 
+    async def _is_rate_limited(self, client_ip: str) -> bool:
+        """Учитывает запрос и проверяет, превышен ли лимит для IP"""
+        if self._redis_script is not None and time.monotonic() >= self._redis_retry_at:
+            try:
+                count = await self._redis_script(
+                    keys=[f"ratelimit:{client_ip}"],
+                    args=[int(time.time() * 1000), self.WINDOW_SECONDS * 1000,
+                          self.max_requests_per_minute, uuid.uuid4().hex]
+                )
+            except Exception as e:
+                # Redis недоступен — переходим на локальные счётчики процесса и
+                # не обращаемся к Redis REDIS_RETRY_SECONDS; сообщаем один раз за сбой
+                self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+                if not self._redis_failing:
+                    self._redis_failing = True
+                    print(f"Ошибка Redis, rate limiting временно локальный: {e}")
+            else:
+                if self._redis_failing:
+                    self._redis_failing = False
+                    print("Redis снова доступен, rate limiting общий")
+                return count > self.max_requests_per_minute
+        return self._is_rate_limited_local(client_ip)
+
+    def _is_rate_limited_local(self, client_ip: str) -> bool:
+        """Локальный rate limiting в памяти процесса"""
+        # Скользящее окно из двух счётчиков: запросы предыдущего минутного окна
+        # учитываются с весом доли, которая ещё попадает в последние 60 секунд
+        current_time = time.time()
+        window, offset = divmod(current_time, self.WINDOW_SECONDS)
+        window = int(window)
+
+        # Раз в окно удаляем IP, не делавшие запросов два окна и больше
+        if window != self._last_prune_window:
+            self._prune(window)
+
+        stored_window, current_count, previous_count = self.requests.get(client_ip, (window, 0, 0))
+        if stored_window != window:
+            previous_count = current_count if stored_window == window - 1 else 0
+            current_count = 0
+
+        estimated = previous_count * (1 - offset / self.WINDOW_SECONDS) + current_count
+        if estimated >= self.max_requests_per_minute:
+            self.requests[client_ip] = (window, current_count, previous_count)
+            return True
+
+        # Учитываем текущий запрос
+        self.requests[client_ip] = (window, current_count + 1, previous_count)
+        return False
+
+    def _prune(self, window: int):
+        """Удаляет счётчики IP, которые больше не влияют на лимит"""
+        self._last_prune_window = window
+        stale = [ip for ip, (stored_window, _, _) in self.requests.items() if stored_window < window - 1]
+        for ip in stale:
+            del self.requests[ip]
+
     def _get_client_ip(self, request: Request) -> str:
         """Получает IP адрес клиента"""
         # Проверяем заголовки прокси
         forwarded = request.headers.get("X-Forwarded-For")
         if forwarded:
-            return forwarded.split(",")[0].strip()
+            # Нужен только первый адрес цепочки прокси
+            return forwarded.partition(",")[0].strip()
 
         # Проверяем заголовок X-Real-IP
         real_ip = request.headers.get("X-Real-IP")
         if real_ip:
             return real_ip
 
-        # Используем client IP из request
-        return request.client.host if request.client else "unknown"
+        # Используем client IP из ASGI scope: кортеж (host, port) без обёртки Address
+        client = request.scope.get("client")
+        return client[0] if client else "unknown"
 
 
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
     """Middleware для добавления security headers"""
 
+    # Заголовки неизменны, поэтому кодируются один раз и добавляются
+    # в raw_headers ответа целиком, без поштучной записи через MutableHeaders
+    STATIC_HEADERS = (
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"DENY"),
+        (b"x-xss-protection", b"1; mode=block"),
+        (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+        (b"content-security-policy", b"default-src 'self'"),
+        # Информация о сервере
+        (b"server", b"EphemerisDecoder/1.0"),
+    )
+
     async def dispatch(self, request: Request, call_next):
         """Добавляет security headers к ответу"""
         response = await call_next(request)
 
         # Добавляем security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Content-Security-Policy"] = "default-src 'self'"
-
-        # Добавляем информацию о сервере
-        response.headers["Server"] = "EphemerisDecoder/1.0"
+        response.raw_headers.extend(self.STATIC_HEADERS)
 
         return response
@@ -2,6 +2,8 @@
 Утилиты для работы со знаками зодиака
 """
 
+from typing import Iterable
+
 ZODIAC_SIGNS = [
     "Овен", "Телец", "Близнецы", "Рак", "Лев", "Дева",
     "Весы", "Скорпион", "Стрелец", "Козерог", "Водолей", "Рыбы"
@@ -9,6 +11,12 @@ ZODIAC_SIGNS = [
 
 ZODIAC_DEGREES = 30
 
+# Названия фаз Луны по 45-градусным секторам угла Луна-Солнце
+MOON_PHASE_NAMES = (
+    "Новолуние", "Растущий серп", "Первая четверть", "Растущая Луна",
+    "Полнолуние", "Убывающая Луна", "Последняя четверть", "Убывающий серп"
+)
+
 
 def degrees_to_sign_and_degrees(longitude: float) -> tuple[str, float]:
     """
@@ -20,17 +28,49 @@ def degrees_to_sign_and_degrees(longitude: float) -> tuple[str, float]:
     Returns:
         tuple: (название знака, градусы в знаке)
     """
-    # Нормализуем долготу в диапазон 0-360
-    longitude = longitude % 360
+    # Нормализуем долготу в диапазон 0-360, затем одним divmod получаем
+    # номер знака (каждый знак занимает 30 градусов) и градусы в знаке.
+    # Для крошечных отрицательных долгот longitude % 360 округляется до 360.0,
+    # поэтому номер знака заворачивается по модулю 12
+    sign_index, degrees_in_sign = divmod(longitude % 360, ZODIAC_DEGREES)
     
-    # Определяем знак (каждый знак занимает 30 градусов)
-    sign_index = int(longitude // ZODIAC_DEGREES)
-    sign_name = ZODIAC_SIGNS[sign_index]
+    return ZODIAC_SIGNS[int(sign_index) % 12], degrees_in_sign
+
+
+def degrees_to_sign_index_batch(longitudes: Iterable[float]) -> tuple[list[int], list[float]]:
+    """
+    Пакетно раскладывает долготы на номера знаков и градусы в знаке
     
-    # Градусы в знаке (остаток от деления на 30)
-    degrees_in_sign = longitude % ZODIAC_DEGREES
+    Числовой вариант для расчётов, где нужен номер знака (0-11), а не название
     
-    return sign_name, degrees_in_sign
+    Args:
+        longitudes: Долготы в градусах
+        
+    Returns:
+        tuple: (номера знаков, градусы в знаке) — параллельные списки
+    """
+    indices = []
+    remainders = []
+    for longitude in longitudes:
+        sign_index, degrees_in_sign = divmod(longitude % 360, ZODIAC_DEGREES)
+        indices.append(int(sign_index) % 12)
+        remainders.append(degrees_in_sign)
+    return indices, remainders
+
+
+def degrees_to_sign_and_degrees_batch(longitudes: Iterable[float]) -> list[tuple[str, float]]:
+    """
+    Пакетная версия degrees_to_sign_and_degrees для всех планет карты за один вызов
+    
+    Args:
+        longitudes: Долготы в градусах
+        
+    Returns:
+        list: (название знака, градусы в знаке) для каждой долготы
+    """
+    indices, remainders = degrees_to_sign_index_batch(longitudes)
+    signs = ZODIAC_SIGNS
+    return [(signs[index], degrees) for index, degrees in zip(indices, remainders)]
 
 
 def normalize_angle(angle: float) -> float:
@@ -58,6 +98,19 @@ def calculate_orb(angle1: float, angle2: float) -> float:
         float: Орбис в градусах
     """
     diff = abs(angle1 - angle2)
-    return min(diff, 360 - diff)
+    # Ветвление дешевле вызова min() и даёт тот же результат
+    return 360 - diff if diff > 180 else diff
 
 
+def moon_phase_name(angle: float) -> str:
+    """
+    Определяет название фазы Луны по углу Луна-Солнце
+    
+    Args:
+        angle: Угол между Луной и Солнцем в градусах (0-360)
+        
+    Returns:
+        str: Название фазы
+    """
+    # Номер сектора по 45°; & 7 заворачивает 360° в новолуние
+    return MOON_PHASE_NAMES[int(angle // 45) & 7]